@@ -1,65 +1,134 @@
+import argparse
 import json
 import chromadb
-from chromadb.utils import embedding_functions
-
-# 1️⃣ PersistentClient kullan (in-memory değil!)
-client = chromadb.PersistentClient(path="./chroma_db")  # ✅ BUNU KULLAN
-
-# 2️⃣ Ollama embedding fonksiyonu
-embedding_fn = embedding_functions.OllamaEmbeddingFunction(
-    model_name="nomic-embed-text",
-    url="http://localhost:11434/api/embeddings"
-)
-
-# 3️⃣ Koleksiyonu sil ve yeniden oluştur
-collection_name = "courses"
-
-try:
-    client.delete_collection(name=collection_name)
-    print(f"✅ Eski koleksiyon silindi")
-except:
-    print(f"⚠️ Koleksiyon zaten yoktu")
-
-# Embedding fonksiyonu ile koleksiyon oluştur
-collection = client.create_collection(
-    name=collection_name,
-    embedding_function=embedding_fn
-)
-
-print("✅ Ollama embedding fonksiyonu başarıyla oluşturuldu")
-
-# 4️⃣ JSON dosyasını yükle
-with open("courses_full.json", "r", encoding="utf-8") as f:
-    courses = json.load(f)
-
-# 5️⃣ Her kursu ChromaDB'ye ekle
-for idx, course in enumerate(courses):
-    doc_text = f"{course['course_name']}. {course['description']}"
-    
-    collection.add(
-        documents=[doc_text],
-        metadatas=[course],
-        ids=[str(idx)]
+
+from retrieval.catalog import index_catalog, ingest_courses, sync_courses
+from retrieval.embedding import EMBED_MODEL, backend_metadata, check_collection_backend, get_backend
+from retrieval.embedding_cache import CachedOllamaEmbeddingFunction, embed_queries
+from retrieval.hnsw_profiles import HNSW_PROFILE, HNSW_PROFILES, hnsw_metadata
+from retrieval.numpy_index import PRECISIONS, NumpyCourseIndex
+from retrieval.recommendation_table import COURSE_TABLE_PATH, RecommendationTable
+
+COLLECTION_NAME = "courses"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kurs kataloğunu ChromaDB'ye ekle")
+    parser.add_argument("--courses", default="courses_full.json", help="Kurs JSON dosyası")
+    parser.add_argument("--db", default="./chroma_db", help="ChromaDB dizini")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch başına kurs sayısı")
+    parser.add_argument("--workers", type=int, default=4, help="Eşzamanlı embedding isteği sayısı")
+    parser.add_argument(
+        "--mode", choices=["sync", "rebuild"], default="sync",
+        help="sync: sadece farkları yaz, rebuild: koleksiyonu silip baştan oluştur"
+    )
+    parser.add_argument(
+        "--export-npy", nargs="?", const="course_index", default=None, metavar="PATH",
+        help="Koleksiyonu bellek içi arama için PATH.npy / PATH.json olarak da dışa aktar (varsayılan: course_index)"
+    )
+    parser.add_argument(
+        "--export-precision", choices=PRECISIONS, default="float32",
+        help="--export-npy ile birlikte ilk geçiş araması için sıkıştırılmış kopya da yaz"
+    )
+    parser.add_argument(
+        "--hnsw-profile", choices=list(HNSW_PROFILES), default=HNSW_PROFILE,
+        help="Yeni oluşturulan koleksiyonun HNSW ayarları (mevcut koleksiyonda rebuild gerekir)"
+    )
+    parser.add_argument("--table", default=COURSE_TABLE_PATH, help="Dil × seviye öneri tablosu dosyası")
+    parser.add_argument("--top-n", type=int, default=20, help="Öneri tablosunda kayıt başına kurs sayısı")
+    args = parser.parse_args()
+
+    # 1️⃣ PersistentClient kullan (in-memory değil!)
+    client = chromadb.PersistentClient(path=args.db)
+
+    # 2️⃣ Ollama embedding fonksiyonu (sorgular için; ekleme sırasında embedding'ler hazır verilir)
+    embedding_fn = CachedOllamaEmbeddingFunction(
+        model_name=EMBED_MODEL,
+        url="http://localhost:11434/api/embeddings"
+    )
+
+    # 3️⃣ rebuild modunda koleksiyonu sil; sync modunda mevcut koleksiyon korunur
+    backend = get_backend()
+    print(f"🧮 Embedding backend'i: {backend.key}")
+    existing = COLLECTION_NAME in [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    if args.mode == "sync" and existing:
+        if not check_collection_backend(client.get_collection(COLLECTION_NAME), backend):
+            print("🔁 Farklı backend ile oluşturulmuş koleksiyon baştan oluşturulacak")
+            args.mode = "rebuild"
+
+    if args.mode == "rebuild":
+        try:
+            client.delete_collection(name=COLLECTION_NAME)
+            print(f"✅ Eski koleksiyon silindi")
+        except:
+            print(f"⚠️ Koleksiyon zaten yoktu")
+
+    # Embedding fonksiyonu ile koleksiyonu al veya oluştur
+    # Cosine: similarity = 1 - distance hesabı ve normalize vektörler için
+    # Koleksiyon hangi backend ve boyutla oluşturulduğunu metadata'sında saklar;
+    # boyut ölçümü embedding isteği yaptığı için yalnızca oluştururken hesaplanır
+    if args.mode == "sync" and existing:
+        collection = client.get_collection(name=COLLECTION_NAME, embedding_function=embedding_fn)
+    else:
+        collection = client.create_collection(
+            name=COLLECTION_NAME,
+            embedding_function=embedding_fn,
+            metadata={**hnsw_metadata(args.hnsw_profile), **backend_metadata(backend)}
+        )
+
+    print("✅ Ollama embedding fonksiyonu başarıyla oluşturuldu")
+
+    # 4️⃣ JSON dosyasını yükle
+    with open(args.courses, "r", encoding="utf-8") as f:
+        courses = json.load(f)
+
+    # 5️⃣ Kursları batch'ler halinde ChromaDB'ye yaz
+    if args.mode == "rebuild":
+        items = list(index_catalog(courses).items())
+        total, elapsed = ingest_courses(collection, items, args.batch_size, args.workers)
+        touched_ids = None
+        print(f"\n✅ {total} kurs '{args.db}' dizinine kaydedildi")
+    else:
+        diff = sync_courses(collection, courses, args.batch_size, args.workers)
+        total, elapsed = len(diff["added"]) + len(diff["changed"]), diff["elapsed"]
+        touched_ids = diff["added"] + diff["changed"] + diff["removed"]
+        print(f"\n✅ Senkronizasyon tamamlandı: {total} kurs yazıldı, {len(diff['removed'])} kurs silindi")
+
+    if total:
+        print(f"⏱️ Süre: {elapsed:.1f} sn ({total / max(elapsed, 1e-9):.1f} kurs/sn)")
+    print(f"📂 Veritabanı yolu: {args.db}/chroma.sqlite3")
+
+    index = NumpyCourseIndex.from_collection(collection)
+    if args.export_npy:
+        index.quantize(args.export_precision).save(args.export_npy)
+        print(f"📦 Bellek içi indeks kaydedildi: {args.export_npy}.npy")
+
+    # 6️⃣ Dil × seviye öneri tablosunu oluştur veya sadece etkilenen kayıtları güncelle
+    table = None if touched_ids is None else RecommendationTable.load(args.table)
+    if table is None or table.top_n != args.top_n:
+        table = RecommendationTable(top_n=args.top_n)
+        refreshed = table.build(index, embed_queries)
+    else:
+        refreshed = table.update(index, touched_ids, embed_queries)
+    table.save(args.table)
+    print(f"📋 Öneri tablosu: {refreshed}/{len(table.entries)} kayıt yeniden hesaplandı ({args.table})")
+
+    # 7️⃣ Test sorgusu
+    print("\n--- Test Sorgusu ---")
+    results = collection.query(
+        query_embeddings=embed_queries(["python programming"], backend),
+        n_results=3
     )
-    
-    if (idx + 1) % 10 == 0:
-        print(f"İşlenen kurs: {idx + 1}/{len(courses)}")
 
-print(f"\n✅ {len(courses)} kurs './chroma_db' dizinine kaydedildi")
-print(f"📂 Veritabanı yolu: ./chroma_db/chroma.sqlite3")
+    print(f"Bulunan sonuç sayısı: {len(results['documents'][0])}")
 
-# 6️⃣ Test sorgusu
-print("\n--- Test Sorgusu ---")
-results = collection.query(
-    query_texts=["python programming"],
-    n_results=3
-)
+    for i, (doc, metadata) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
+        print(f"\n{i+1}. Kurs: {metadata['course_name']}")
+        print(f"   Platform: {metadata.get('platform', 'N/A')}")
+        print(f"   Açıklama: {doc[:100]}...")
 
-print(f"Bulunan sonuç sayısı: {len(results['documents'][0])}")
+    print(f"\n✅ Koleksiyon toplam döküman sayısı: {collection.count()}")
 
-for i, (doc, metadata) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
-    print(f"\n{i+1}. Kurs: {metadata['course_name']}")
-    print(f"   Platform: {metadata.get('platform', 'N/A')}")
-    print(f"   Açıklama: {doc[:100]}...")
 
-print(f"\n✅ Koleksiyon toplam döküman sayısı: {collection.count()}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import multiprocessing
+import queue
+import resource
+import time
+
+from cv_mechanism.model_manager import CV_MODEL_NAME, PRECISIONS
+
+
+def run_precision(model_name, precision, threads, prompt, max_new_tokens, results):
+    """Ayrı süreçte çalışır: modeli verilen hassasiyetle yükle, greedy üretim yap, ölçümleri döndür"""
+    import torch
+    from cv_mechanism.model_manager import CounsellorModelManager
+
+    manager = CounsellorModelManager(model_name, idle_seconds=0, precision=precision, threads=threads)
+    start = time.perf_counter()
+    manager.ensure_loaded()
+    load_seconds = time.perf_counter() - start
+
+    with manager.use() as (model, tokenizer, device):
+        inputs = tokenizer(prompt, return_tensors="pt").to(device)
+        prompt_tokens = inputs["input_ids"].shape[1]
+        with torch.no_grad():
+            start = time.perf_counter()
+            # Çıktı uyumunu karşılaştırabilmek için örnekleme kapalı
+            output = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+            seconds = time.perf_counter() - start
+        tokens = output[0, prompt_tokens:].tolist()
+
+    results.put({
+        "precision": manager.active_precision,
+        "requested": precision,
+        "load_s": load_seconds,
+        "tokens": tokens,
+        "tokens_per_s": len(tokens) / seconds,
+        # Linux'ta ru_maxrss KB cinsindendir
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def agreement(tokens, reference):
+    """Referansla aynı pozisyondaki token oranı ve ilk ayrışmaya kadar ortak önek uzunluğu"""
+    if not reference:
+        return 0.0, 0
+    same = sum(a == b for a, b in zip(tokens, reference))
+    prefix = 0
+    for a, b in zip(tokens, reference):
+        if a != b:
+            break
+        prefix += 1
+    return same / len(reference), prefix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Counsellor modelini fp32 / bf16 / int8 modlarında karşılaştır")
+    parser.add_argument("--model", default=CV_MODEL_NAME)
+    parser.add_argument("--cv", default="cv_parsed.md", help="Prompt'a eklenecek CV metni")
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--timeout", type=float, default=1800, help="Mod başına en fazla bekleme süresi (sn)")
+    args = parser.parse_args()
+
+    from cv_mechanism.converter import build_prompt
+
+    with open(args.cv, encoding="utf-8") as f:
+        prompt = build_prompt(f.read().strip())
+
+    # Her mod temiz bir süreçte ölçülür ki tepe RSS birbirine karışmasın
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for precision in args.precisions:
+        results = ctx.Queue()
+        process = ctx.Process(
+            target=run_precision,
+            args=(args.model, precision, args.threads, prompt, args.max_new_tokens, results),
+        )
+        process.start()
+        # Süreç sonuç yazmadan ölürse (OOM vb.) get() sonsuza dek beklemesin
+        row = None
+        deadline = time.monotonic() + args.timeout
+        while row is None and time.monotonic() < deadline:
+            exited = not process.is_alive()
+            try:
+                row = results.get(timeout=1)
+            except queue.Empty:
+                if exited:
+                    break
+        timed_out = row is None and process.is_alive()
+        if timed_out:
+            process.terminate()
+        process.join()
+        if row is None:
+            reason = "zaman aşımı" if timed_out else f"çıkış kodu {process.exitcode}"
+            print(f"❌ {precision} ölçümü başarısız ({reason})")
+            continue
+        rows.append(row)
+
+    reference = next((row["tokens"] for row in rows if row["precision"] == "fp32"), None)
+    print(f"\n🧪 {args.model}, {args.max_new_tokens} yeni token, threads={args.threads or 'varsayılan'}\n")
+    print(f"{'mod':<6} {'yükleme s':>10} {'token/s':>9} {'tepe RSS MB':>12} {'uyum':>7} {'ortak önek':>11}")
+    for row in rows:
+        if reference is None:
+            match, prefix = "-", "-"
+        else:
+            ratio, prefix = agreement(row["tokens"], reference)
+            match = f"{ratio:.1%}"
+        label = row["precision"] if row["precision"] == row["requested"] else f"{row['requested']}→{row['precision']}"
+        print(f"{label:<6} {row['load_s']:>10.1f} {row['tokens_per_s']:>9.1f} {row['peak_rss_mb']:>12.0f} {match:>7} {prefix:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+
+import chromadb
+import numpy as np
+
+from retrieval.embedding import batched
+from retrieval.embedding_cache import embed_queries
+from retrieval.hnsw_profiles import HNSW_PROFILES, hnsw_metadata
+from retrieval.numpy_index import NumpyCourseIndex
+from retrieval.recommendation_table import catalog_languages, language_query
+
+
+def load_queries(index, mode, n_queries, seed):
+    """Benchmark sorguları: 'sample' korpustan rastgele vektörler, 'languages' gerçek dil sorguları"""
+    if mode == "languages":
+        texts = [language_query(lang) for lang in catalog_languages(index)]
+        return np.asarray(embed_queries(texts), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(index.count(), size=min(n_queries, index.count()), replace=False)
+    return np.asarray(index.embeddings[picks], dtype=np.float32)
+
+
+def benchmark_profile(profile, index, queries, truth, k, batch_size):
+    """Profil ile geçici koleksiyon kur; recall@k ve sorgu gecikmelerini ölç"""
+    client = chromadb.EphemeralClient()
+    name = f"hnsw_bench_{profile}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(profile), embedding_function=None)
+
+    start = time.perf_counter()
+    for rows in batched(list(range(index.count())), batch_size):
+        collection.add(
+            ids=[index.ids[i] for i in rows],
+            embeddings=np.asarray(index.embeddings[rows]).tolist(),
+        )
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(result["ids"][0]) & expected)
+
+    client.delete_collection(name)
+    latencies = np.asarray(latencies)
+    return {
+        "profile": profile,
+        "recall": hits / (k * len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "build_s": build_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW profillerini kesin aramaya karşı karşılaştır")
+    parser.add_argument("--db", default="./chroma_db", help="ChromaDB dizini")
+    parser.add_argument("--collection", default="courses", help="Kaynak koleksiyon (örn. courses, pdf_documents)")
+    parser.add_argument("--profiles", nargs="+", default=list(HNSW_PROFILES), choices=list(HNSW_PROFILES))
+    parser.add_argument("--queries", choices=["sample", "languages"], default="sample",
+                        help="sample: korpustan vektörler, languages: katalog dilleri için gerçek sorgular")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10, help="recall@k için k")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.db)
+    index = NumpyCourseIndex.from_collection(client.get_collection(args.collection))
+    print(f"📦 '{args.collection}': {index.count()} kayıt, {index.embeddings.shape[1]} boyut")
+
+    queries = load_queries(index, args.queries, args.n_queries, args.seed)
+    k = min(args.k, index.count())
+    top_idx, _ = index.search(queries, k)
+    truth = [{index.ids[i] for i in row} for row in top_idx]
+
+    print(f"🔍 {len(queries)} sorgu, recall@{k} kesin aramaya göre\n")
+    print(f"{'profil':<10} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} {'kurulum s':>10}")
+    for profile in args.profiles:
+        row = benchmark_profile(profile, index, queries, truth, k, args.batch_size)
+        print(f"{row['profile']:<10} {row['recall']:>8.3f} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['build_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,70 +5,85 @@ from operator import add as add_messages
 
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.documents import Document
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
 from langchain_core.tools import tool
 from langchain_community.embeddings import FastEmbedEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_community.llms import Ollama
+from langchain_ollama import ChatOllama
+
+from retrieval.bm25 import BM25Index, tokenize
+from retrieval.chunking import chunk_text, file_fingerprint, get_document_registry, iter_new_chunks
+from retrieval.embedding import batched
+from retrieval.embedding_cache import CachedQueryEmbeddings
+from retrieval.pdf_pipeline import iter_pdf_pages, prefetch
+from retrieval.ranking import reciprocal_rank_fusion
+from retrieval.result_cache import ResultCache
 
 from fastapi import FastAPI, UploadFile, File
 from pydantic import BaseModel
-import PyPDF2
 import io
 
 # ---------------------------------------------------------------------
 # PDF İşleme Fonksiyonları (YENİ)
 # ---------------------------------------------------------------------
 def extract_text_from_pdf(pdf_file):
-    """PDF'den metin çıkar"""
-    text_chunks = []
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    
-    for page_num, page in enumerate(pdf_reader.pages):
-        text = page.extract_text()
+    """PDF'den metni sayfa sayfa üret (generator)"""
+    for page_num, text in iter_pdf_pages(pdf_file):
         if text.strip():
-            text_chunks.append({
+            yield {
                 'text': text,
-                'page': page_num + 1
-            })
-    
-    return text_chunks
-
-def chunk_text(text, chunk_size=500, overlap=50):
-    """Metni parçalara böl"""
-    words = text.split()
-    chunks = []
-    
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = ' '.join(words[i:i + chunk_size])
-        if chunk.strip():
-            chunks.append(chunk)
-    
-    return chunks
+                'page': page_num
+            }
 
-def add_pdf_to_vectorstore(pdf_file, filename: str, vectorstore, chunk_size=500, overlap=50):
-    """PDF'i Chroma veritabanına ekle"""
-    pages = extract_text_from_pdf(pdf_file)
-    
-    all_texts = []
-    all_metadatas = []
-    
-    for page_data in pages:
-        chunks = chunk_text(page_data['text'], chunk_size, overlap)
-        
-        for chunk_idx, chunk in enumerate(chunks):
-            all_texts.append(chunk)
-            all_metadatas.append({
+def iter_pdf_chunks(pdf_file, filename: str, chunk_size=500, overlap=50):
+    """PDF'den (parça, metadata) akışı üret"""
+    for page_data in extract_text_from_pdf(pdf_file):
+        for chunk_idx, chunk in enumerate(chunk_text(page_data['text'], chunk_size, overlap)):
+            yield chunk, {
                 'source': filename,
                 'page': page_data['page'],
                 'chunk': chunk_idx
-            })
+            }
+
+def add_pdf_to_vectorstore(pdf_file, filename: str, vectorstore, chunk_size=500, overlap=50,
+                           batch_size=64, queue_size=256, lexical_index=None):
+    """
+    PDF'i Chroma veritabanına akış halinde ekle.
+    Parçalar arka planda sınırlı bir kuyruğa çıkarılır ve her batch hemen yazılır;
+    bellek kullanımı PDF boyutundan bağımsızdır. Yeni parçalar BM25 indeksine de
+    eklenir (lexical_index verilmezse modül genelindeki indeks kullanılır).
+
+    Parça id'leri normalize içerik hash'idir; veritabanında zaten olan parçalar
+    embed edilmez. Daha önce tamamen eklenmiş aynı PDF tekrar gelirse hiçbir şey yapılmaz.
+    """
+    if lexical_index is None:
+        lexical_index = default_lexical_index()
+    registry = get_document_registry()
+    fingerprint = file_fingerprint(pdf_file)
+    collection = vectorstore._collection.name
+    existing_ids = lambda ids: set(vectorstore.get(ids=ids, include=[])["ids"])
+    if registry.is_ingested(collection, fingerprint, existing_ids):
+        print(f"⏭️ '{filename}' daha önce eklenmiş, atlanıyor")
+        return 0
+    
+    chunks = prefetch(iter_pdf_chunks(pdf_file, filename, chunk_size, overlap), maxsize=queue_size)
+    chunk_ids = set()
+    new_chunks = iter_new_chunks(chunks, existing_ids, seen=chunk_ids)
     
-    if all_texts:
-        vectorstore.add_texts(texts=all_texts, metadatas=all_metadatas)
-        return len(all_texts)
+    total = 0
+    for batch in batched(new_chunks, batch_size):
+        ids = [cid for cid, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+        metadatas = [meta for _, _, meta in batch]
+        vectorstore.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+        lexical_index.add(ids, texts, metadatas)
+        # Yeni içerik yazıldı: önbellekteki retriever sonuçları artık eski
+        retrieval_cache.invalidate()
+        total += len(batch)
     
-    return 0
+    registry.record(collection, fingerprint, filename, total, chunk_ids)
+    return total
 
 # ---------------------------------------------------------------------
 # Ortam değişkenleri ve model yükleme
@@ -76,22 +91,29 @@ def add_pdf_to_vectorstore(pdf_file, filename: str, vectorstore, chunk_size=500,
 load_dotenv()
 
 DB_PATH = "chroma_db"
+CHAT_EMBED_MODEL = os.getenv("CHAT_EMBED_MODEL", "BAAI/bge-small-en-v1.5")
 MODEL_NAME = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
 
-try:
-    llm = Ollama(model=MODEL_NAME, temperature=0.7)
-    print(f"✅ Ollama modeli '{MODEL_NAME}' başarıyla yüklendi.")
-except Exception as e:
-    print(f"⚠ Ollama bağlantı hatası: {e}")
-    print("💡 'ollama serve' komutunun çalıştığından emin ol.")
-    llm = None
+# Prefix (KV) cache'in turlar arasında korunması için model bellekte tutulmalı
+# ve bağlam boyutu sabit kalmalı; num_ctx değişirse Ollama modeli yeniden yükler.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+# Bağlamda yanıt için ayrılan token sayısı; geçmiş num_ctx - bu değere sığacak şekilde kırpılır
+CHAT_RESPONSE_TOKENS = int(os.getenv("CHAT_RESPONSE_TOKENS", "1024"))
+# Token sayısı tahmini için karakter/token oranı (Türkçe için temkinli)
+CHARS_PER_TOKEN = 3
 
 # ---------------------------------------------------------------------
 # Chroma vektör veritabanı setup
 # ---------------------------------------------------------------------
 def init_vectorstore():
     """Chroma veritabanını başlatır veya mevcut olanı yükler."""
-    embeddings = FastEmbedEmbeddings()
+    # Sorgu embedding'leri kurs aramasıyla aynı kalıcı önbellekte tutulur.
+    # FastEmbed modeli açılışta değil, ilk önbellek kaçırmasında yüklenir (hızlı soğuk başlangıç).
+    embeddings = CachedQueryEmbeddings(
+        model=f"fastembed:{CHAT_EMBED_MODEL}",
+        factory=lambda: FastEmbedEmbeddings(model_name=CHAT_EMBED_MODEL),
+    )
     vectorstore = Chroma(
         persist_directory=DB_PATH,
         embedding_function=embeddings
@@ -100,6 +122,67 @@ def init_vectorstore():
 
 vectorstore = init_vectorstore()
 
+# Hibrit arama için BM25 indeksi; mevcut parçalarla başlatılır, yeni PDF'lerle güncellenir
+HYBRID_FETCH_K = 10
+RRF_K = 60
+# Kısa, anahtar kelime ağırlıklı sorgularda tüm terimler bir parçada geçiyorsa
+# sadece sözcüksel sonuçlar kullanılır (embedding hesaplanmaz)
+LEXICAL_SHORTCUT_MAX_TERMS = 4
+
+def init_lexical_index(vectorstore):
+    """Vektör veritabanındaki parçalardan BM25 indeksini oluşturur."""
+    index = BM25Index()
+    data = vectorstore.get(include=["documents", "metadatas"])
+    index.add(data["ids"], data["documents"], data["metadatas"])
+    return index
+
+lexical_index = init_lexical_index(vectorstore)
+
+
+def default_lexical_index():
+    """add_pdf_to_vectorstore'un varsayılan BM25 indeksi (hybrid_search'ün kullandığı indeks)"""
+    return lexical_index
+
+# retriever_tool sonuçları için önbellek; add_pdf_to_vectorstore her yazmada geçersiz kılar
+retrieval_cache = ResultCache(
+    max_items=int(os.getenv("RETRIEVAL_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("RETRIEVAL_CACHE_TTL", "600")),
+)
+
+def hybrid_search(query: str, k: int = 3):
+    """BM25 ve vektör sonuçlarını reciprocal rank fusion ile birleştirir."""
+    lexical_hits = lexical_index.search(query, k=HYBRID_FETCH_K)
+    
+    # Sözcüksel hızlı yol: kısa sorgu ve tüm terimleri içeren yeterli sayıda parça
+    if (
+        len(tokenize(query)) <= LEXICAL_SHORTCUT_MAX_TERMS
+        and len(lexical_hits) >= k
+        and all(coverage == 1.0 for _, _, coverage in lexical_hits[:k])
+    ):
+        return [
+            Document(page_content=lexical_index.get(doc_id)[0], metadata=lexical_index.get(doc_id)[1])
+            for doc_id, _, _ in lexical_hits[:k]
+        ]
+    
+    # Parça embedding'leri Chroma'da float32 aranır; float16/int8 ilk geçiş yalnızca
+    # kurs kataloğunun NumpyCourseIndex'inde var
+    dense_docs = vectorstore.similarity_search(query, k=HYBRID_FETCH_K)
+    
+    # Parçaları içerikleri üzerinden eşle (dense sonuçlar id döndürmeyebilir)
+    candidates = {}
+    lexical_ranking = []
+    for doc_id, _, _ in lexical_hits:
+        text, meta = lexical_index.get(doc_id)
+        candidates.setdefault(text, Document(page_content=text, metadata=meta))
+        lexical_ranking.append(text)
+    dense_ranking = []
+    for doc in dense_docs:
+        candidates.setdefault(doc.page_content, doc)
+        dense_ranking.append(doc.page_content)
+    
+    fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=RRF_K)
+    return [candidates[text] for text, _ in fused[:k]]
+
 # ---------------------------------------------------------------------
 # RAG retriever aracı
 # ---------------------------------------------------------------------
@@ -107,13 +190,18 @@ vectorstore = init_vectorstore()
 def retriever_tool(query: str):
     """Chroma'dan en benzer belgeleri getirir."""
     try:
-        results = vectorstore.similarity_search(query, k=3)
+        cached, version = retrieval_cache.get(query)
+        if cached is not None:
+            return cached
+        results = hybrid_search(query, k=3)
         if not results:
             return "Veritabanında ilgili bilgi bulunamadı."
         text = "\n\n".join([
             f"📄 Kaynak: {doc.metadata.get('source', 'Bilinmiyor')} - Sayfa: {doc.metadata.get('page', 'N/A')}\n{doc.page_content}" 
             for doc in results
         ])
+        # Arama sürerken yeni belge eklendiyse sonuç eski sürüme aittir, kaydedilmez
+        retrieval_cache.put(query, text, version)
         return text
     except Exception as e:
         return f"RAG arama hatası: {e}"
@@ -121,27 +209,82 @@ def retriever_tool(query: str):
 tools = [retriever_tool]
 tools_dict = {t.name: t for t in tools}
 
+# ---------------------------------------------------------------------
+# Chat modeli
+# ---------------------------------------------------------------------
+try:
+    # ChatOllama mesajları /api/chat'e ayrı ayrı gönderir; sistem mesajı ve
+    # önceki turlar her seferinde birebir aynı render edildiği için Ollama
+    # bu ortak öneki cache'ten kullanır, sadece yeni tur prefill edilir.
+    #
+    # Davranış değişikliği: eski Ollama (completion) sarmalayıcısı tool_calls
+    # döndürmediği için retriever_tool hiç çağrılmıyordu. bind_tools ile model
+    # gerçek tool calling yapar; should_continue/take_action yolu artık çalışır
+    # ve RAG araması turlara eklenir (tur başına ek bir model çağrısı).
+    llm = ChatOllama(
+        model=MODEL_NAME,
+        temperature=0.7,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        num_ctx=OLLAMA_NUM_CTX,
+    ).bind_tools(tools)
+    print(f"✅ Ollama modeli '{MODEL_NAME}' başarıyla yüklendi.")
+except Exception as e:
+    print(f"⚠ Ollama bağlantı hatası: {e}")
+    print("💡 'ollama serve' komutunun çalıştığından emin ol.")
+    llm = None
+
 # ---------------------------------------------------------------------
 # Agent graph (LangGraph) setup
 # ---------------------------------------------------------------------
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    # Modele gönderilen geçmişin başladığı mesaj indeksi (kırpma sonrası)
+    history_start: int
+
+SYSTEM_PROMPT = (
+    "Sen bir üniveriste öğrencisi ve yeni mezunlar için kariyer danışmanı ve CV analiz uzmanısın. "
+    "Kullanıcının sorusunu yanıtlamak için gerekirse Chroma vektör veritabanından **retriever_tool** bilgi çekebilirsin. "
+    "Yanıtlarında Nazik ve komik olmaya çalış, ancak bilgiyi net ve anlaşılır şekilde sun. Önemli olan sana soru soran kişinin ihtiyaçlarını karşılamak ve ona yardımcı olmaktır. "
+)
+# Sistem mesajı bir kez oluşturulur; her turda aynı önek gönderilir
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
 
 def build_system_prompt():
-    return (
-        "Sen bir üniveriste öğrencisi ve yeni mezunlar için kariyer danışmanı ve CV analiz uzmanısın. "
-        "Kullanıcının sorusunu yanıtlamak için gerekirse Chroma vektör veritabanından **retriever_tool** bilgi çekebilirsin. "
-        "Yanıtlarında Nazik ve komik olmaya çalış, ancak bilgiyi net ve anlaşılır şekilde sun. Önemli olan sana soru soran kişinin ihtiyaçlarını karşılamak ve ona yardımcı olmaktır. "
-    )
+    return SYSTEM_PROMPT
 
 def should_continue(state: AgentState):
     result = state["messages"][-1]
     return hasattr(result, "tool_calls") and len(result.tool_calls) > 0
 
+def estimate_tokens(message):
+    return len(str(message.content)) // CHARS_PER_TOKEN + 4
+
+def trim_history(messages, start, budget):
+    """
+    Geçmiş bütçeyi aşarsa başlangıcı ileri al; kesim her zaman bir kullanıcı mesajında olur.
+
+    Sınır aşıldığında bütçenin yarısına inilir: sonraki turlarda kesim noktası
+    (ve dolayısıyla Ollama'nın cache'lediği önek) yeniden sınıra kadar sabit kalır.
+    Ollama'nın num_ctx taşınca baştan kendisi kesmesi ise öneki her turda değiştirir.
+    """
+    if sum(estimate_tokens(m) for m in messages[start:]) <= budget:
+        return start
+    remaining = sum(estimate_tokens(m) for m in messages[start:])
+    for i in range(start, len(messages)):
+        if isinstance(messages[i], HumanMessage):
+            start = i
+            if remaining <= budget // 2:
+                break
+        remaining -= estimate_tokens(messages[i])
+    return start
+
 def call_llm(state: AgentState) -> AgentState:
-    messages = [SystemMessage(content=build_system_prompt())] + list(state["messages"])
+    history = list(state["messages"])
+    budget = OLLAMA_NUM_CTX - CHAT_RESPONSE_TOKENS - estimate_tokens(SYSTEM_MESSAGE)
+    start = trim_history(history, state.get("history_start", 0), budget)
+    messages = [SYSTEM_MESSAGE] + history[start:]
     message = llm.invoke(messages)
-    return {"messages": [message]}
+    return {"messages": [message], "history_start": start}
 
 def take_action(state: AgentState) -> AgentState:
     tool_calls = state["messages"][-1].tool_calls
@@ -163,7 +306,13 @@ graph.set_entry_point("llm")
 
 memory = MemorySaver()
 rag_agent = graph.compile(checkpointer=memory)
-config = {"configurable": {"thread_id": "123"}}
+DEFAULT_THREAD_ID = "123"
+
+def get_config(session_id=None):
+    """Oturuma ait LangGraph config'i; aynı oturum aynı mesaj geçmişini (ve öneki) paylaşır"""
+    return {"configurable": {"thread_id": session_id or DEFAULT_THREAD_ID}}
+
+config = get_config()
 
 # ---------------------------------------------------------------------
 # FastAPI arayüzü
@@ -175,9 +324,9 @@ class QueryRequest(BaseModel):
     history: list[str] | None = None
 
 
-def get_response_model(query, history=None):
+def get_response_model(query, history=None, session_id=None):
     user_msg = HumanMessage(content=query)
-    result = rag_agent.invoke({"messages": [user_msg]}, config)
+    result = rag_agent.invoke({"messages": [user_msg]}, get_config(session_id))
     as1 = result['messages'][-1]
     if hasattr(as1, "content"):
         return as1.content
@@ -1,121 +1,146 @@
+import os
+import time
+
 import chromadb
 from chromadb.config import Settings
-import ollama
 from pathlib import Path
 import PyPDF2
 
+from retrieval.chunking import chunk_text, file_fingerprint, get_document_registry, iter_new_chunks
+from retrieval.embedding import backend_metadata, batched, check_collection_backend, embed_batches
+from retrieval.embedding_cache import embed_queries
+from retrieval.hnsw_profiles import hnsw_metadata
+from retrieval.pdf_pipeline import iter_pdf_pages, iter_pdf_pages_parallel, prefetch
+
+# Bu sayfa sayısının altında süreç havuzu açmak kazançtan pahalı
+MIN_PAGES_FOR_POOL = 16
+
+
 class PDFRAGSystem:
-    def __init__(self, collection_name="pdf_documents", persist_directory="./chroma_db"):
+    def __init__(self, collection_name="pdf_documents", persist_directory="./chroma_db", hnsw_profile=None):
         """
         PDF RAG sistemi için ChromaDB ve Ollama embedding kullanımı
         
         Args:
             collection_name: ChromaDB koleksiyon adı
             persist_directory: Veritabanı kayıt dizini
+            hnsw_profile: Yeni koleksiyon için HNSW profili ("latency", "balanced", "recall")
         """
         # ChromaDB client oluştur
         self.client = chromadb.PersistentClient(path=persist_directory)
         
-        # Collection oluştur veya mevcut olanı al
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-    def extract_text_from_pdf(self, pdf_path):
-        """PDF'den metin çıkar"""
-        text_chunks = []
+        # Mevcut collection'ı al ya da oluştur; backend ve boyut yalnızca oluştururken
+        # metadata'ya yazılır (boyut ölçümü embedding isteği gerektirir)
+        try:
+            self.collection = self.client.get_collection(name=collection_name)
+        except Exception:
+            self.collection = self.client.create_collection(
+                name=collection_name,
+                metadata={**hnsw_metadata(hnsw_profile), **backend_metadata()}
+            )
+        if not check_collection_backend(self.collection):
+            raise ValueError(f"'{collection_name}' koleksiyonu farklı bir embedding backend'i ile oluşturulmuş")
         
+    def extract_text_from_pdf(self, pdf_path, workers=None):
+        """
+        PDF'den metni sayfa sayfa üret (generator); büyük PDF'lerde sayfa aralıkları
+        süreç havuzunda paralel işlenir
+
+        Args:
+            pdf_path: PDF dosya yolu
+            workers: Çıkarma süreç sayısı (None: CPU sayısı, 1: seri)
+        """
         with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                text = page.extract_text()
-                if text.strip():
-                    text_chunks.append({
-                        'text': text,
-                        'page': page_num + 1,
-                        'source': Path(pdf_path).name
-                    })
-        
-        return text_chunks
-    
-    def chunk_text(self, text, chunk_size=500, overlap=50):
-        """Metni parçalara böl"""
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            chunks.append(chunk)
-            
-        return chunks
+            page_count = len(PyPDF2.PdfReader(file).pages)
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or page_count < MIN_PAGES_FOR_POOL:
+            pages = iter_pdf_pages(pdf_path)
+        else:
+            pages = iter_pdf_pages_parallel(pdf_path, workers)
+
+        source = Path(pdf_path).name
+        for page_num, text in pages:
+            if text.strip():
+                yield {'text': text, 'page': page_num, 'source': source}
     
-    def get_ollama_embedding(self, text, model="nomic-embed-text"):
-        """Ollama kullanarak embedding oluştur"""
-        try:
-            response = ollama.embeddings(model=model, prompt=text)
-            return response['embedding']
-        except Exception as e:
-            print(f"Embedding hatası: {e}")
-            return None
+    def iter_chunks(self, pages, chunk_size=500, overlap=50):
+        """Sayfa akışından (parça, metadata) akışı üret"""
+        for page_data in pages:
+            for chunk_idx, chunk in enumerate(chunk_text(page_data['text'], chunk_size, overlap)):
+                yield chunk, {
+                    'source': page_data['source'],
+                    'page': page_data['page'],
+                    'chunk': chunk_idx
+                }
     
-    def add_pdf_to_chroma(self, pdf_path, chunk_size=500, overlap=50):
-        """PDF'i ChromaDB'ye ekle"""
+    def add_pdf_to_chroma(self, pdf_path, chunk_size=500, overlap=50, batch_size=32, workers=4, queue_size=64):
+        """
+        PDF'i ChromaDB'ye ekle
+
+        Sayfa → parça → embedding batch'i → yazma adımları akış halinde çalışır:
+        çıkarma arka planda sınırlı bir kuyruğa yazar, parçalar batch'ler halinde
+        eşzamanlı embed edilir ve her batch hemen yazılır. Bellek kullanımı PDF
+        boyutundan bağımsızdır ve ilk parçalar çıkarma bitmeden aranabilir olur.
+
+        Parça id'leri normalize içerik hash'idir: koleksiyonda zaten olan parçalar
+        (tekrarlayan başlık/altbilgi vb.) embed edilmez. Daha önce tamamen eklenmiş
+        aynı PDF tekrar verilirse hiçbir şey yapılmaz.
+
+        Args:
+            pdf_path: PDF dosya yolu
+            chunk_size: Parça başına kelime sayısı
+            overlap: Parçalar arası örtüşen kelime sayısı
+            batch_size: Embedding isteği başına parça sayısı
+            workers: Eşzamanlı embedding isteği sayısı
+            queue_size: Çıkarma ile embedding arasındaki kuyrukta bekleyebilecek sayfa sayısı
+        """
         print(f"PDF işleniyor: {pdf_path}")
+        start = time.perf_counter()
         
-        # PDF'den metin çıkar
-        pages = self.extract_text_from_pdf(pdf_path)
+        registry = get_document_registry()
+        fingerprint = file_fingerprint(pdf_path)
+        existing_ids = lambda ids: set(self.collection.get(ids=ids, include=[])["ids"])
+        if registry.is_ingested(self.collection.name, fingerprint, existing_ids):
+            print(f"⏭️ {Path(pdf_path).name} daha önce eklenmiş, atlanıyor")
+            return 0
         
-        documents = []
-        embeddings = []
-        metadatas = []
-        ids = []
+        pages = prefetch(self.extract_text_from_pdf(pdf_path), maxsize=queue_size)
+        chunks = self.iter_chunks(pages, chunk_size, overlap)
+        chunk_ids = set()
+        new_chunks = iter_new_chunks(chunks, existing_ids, seen=chunk_ids)
         
         doc_id = 0
-        
-        for page_data in pages:
-            # Metni parçalara böl
-            chunks = self.chunk_text(page_data['text'], chunk_size, overlap)
-            
-            for chunk_idx, chunk in enumerate(chunks):
-                # Embedding oluştur
-                embedding = self.get_ollama_embedding(chunk)
-                
-                if embedding:
-                    documents.append(chunk)
-                    embeddings.append(embedding)
-                    metadatas.append({
-                        'source': page_data['source'],
-                        'page': page_data['page'],
-                        'chunk': chunk_idx
-                    })
-                    ids.append(f"doc_{doc_id}")
-                    doc_id += 1
-                    
-                    print(f"İşlendi: Sayfa {page_data['page']}, Parça {chunk_idx}")
-        
-        # ChromaDB'ye ekle
-        if documents:
+        for batch, embeddings in embed_batches(
+            batched(new_chunks, batch_size), workers=workers, text_key=lambda item: item[1]
+        ):
+            # ChromaDB'ye toplu ekle
             self.collection.add(
-                documents=documents,
+                documents=[chunk for _, chunk, _ in batch],
                 embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
+                metadatas=[meta for _, _, meta in batch],
+                ids=[cid for cid, _, _ in batch]
             )
-            print(f"\n✓ Toplam {len(documents)} parça ChromaDB'ye eklendi!")
+            doc_id += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"İşlendi: {doc_id} parça, son sayfa {batch[-1][2]['page']} ({doc_id / elapsed:.1f} parça/sn)")
+        
+        registry.record(self.collection.name, fingerprint, Path(pdf_path).name, doc_id, chunk_ids)
+        if doc_id:
+            print(f"\n✓ Toplam {doc_id} yeni parça ChromaDB'ye eklendi! ({time.perf_counter() - start:.1f} sn)")
         
-        return len(documents)
+        return doc_id
     
     def query(self, query_text, n_results=5):
         """Sorgu yap ve benzer dokümanları getir"""
-        # Sorgu için embedding oluştur
-        query_embedding = self.get_ollama_embedding(query_text)
-        
-        if not query_embedding:
+        # Sorgu için embedding oluştur (ingestion ile aynı backend, önbellekli)
+        try:
+            query_embedding = embed_queries([query_text])[0]
+        except Exception as e:
+            print(f"Embedding hatası: {e}")
             return None
         
-        # ChromaDB'de ara
+        # ChromaDB'de ara (HNSW, float32; sıkıştırılmış ilk geçiş yalnızca kurs kataloğu için)
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results
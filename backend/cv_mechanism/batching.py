@@ -0,0 +1,99 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Tek generate çağrısında birleştirilecek en fazla CV sayısı
+CV_MAX_BATCH_SIZE = int(os.getenv("CV_MAX_BATCH_SIZE", "4"))
+# İlk istek geldikten sonra diğerleri için beklenecek süre (ms)
+CV_BATCH_WINDOW_MS = int(os.getenv("CV_BATCH_WINDOW_MS", "50"))
+
+
+class TaskCancelled(RuntimeError):
+    pass
+
+
+class BatchScheduler:
+    """
+    Eşzamanlı gelen prompt'ları kısa bir pencere boyunca toplayıp tek
+    batch halinde üreten zamanlayıcı.
+
+    generate_fn prompt listesini (ve on_text / should_stop ile satır başına
+    akış ve iptal callback'lerini) alıp aynı sırada çıktı listesi döndürmeli;
+    her çağıran yalnızca kendi çıktısını Future üzerinden alır.
+    """
+
+    def __init__(self, generate_fn, max_batch_size=CV_MAX_BATCH_SIZE, window_ms=CV_BATCH_WINDOW_MS):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cv-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, prompt, on_text=None, should_stop=None):
+        """
+        Prompt'u bir sonraki batch'e ekle; on_text üretilen metni akış halinde alır.
+        should_stop True döndürdüğünde istek batch'e alınmaz ya da üretimi durdurulur.
+        """
+        self._start()
+        future = Future()
+        self._queue.put((prompt, on_text, should_stop, future))
+        return future
+
+    def generate(self, prompt, on_text=None, should_stop=None):
+        return self.submit(prompt, on_text, should_stop).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            for item in self._collect():
+                should_stop = item[2]
+                if should_stop is not None and should_stop():
+                    item[3].set_exception(TaskCancelled("İstek iptal edildi"))
+                else:
+                    batch.append(item)
+            if not batch:
+                continue
+
+            prompts = [prompt for prompt, _, _, _ in batch]
+            options = {}
+            callbacks = [on_text for _, on_text, _, _ in batch]
+            if any(callback is not None for callback in callbacks):
+                options["on_text"] = callbacks
+            stop_checks = [should_stop for _, _, should_stop, _ in batch]
+            if any(check is not None for check in stop_checks):
+                options["should_stop"] = stop_checks
+            try:
+                outputs = self.generate_fn(prompts, **options)
+            except Exception as e:
+                for _, _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, _, _, future), output in zip(batch, outputs):
+                future.set_result(output)
@@ -1,6 +1,8 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+import os
+
 from cv_mechanism.main_converter import test_llama_parse
+from cv_mechanism.batching import BatchScheduler, TaskCancelled
+from cv_mechanism.model_manager import get_model_manager
 import re
 import re
 
@@ -61,21 +63,44 @@ def extract_report(text: str) -> str:
     match = re.search(r"Report:\s*(.*)", text, re.DOTALL | re.IGNORECASE)
     return match.group(1).strip() if match else text.strip()
 
-model_name = "Geetansh007/Counsellor"
-print("Model yükleniyor...")
 
-# Cihaz seçimi (GPU varsa kullan)
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print("Kullanılan cihaz:", device)
+class SectionTracker:
+    """
+    Akan rapor metninden tamamlanan bölümleri yakalar.
 
-# Model + Tokenizer
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
+    Bir başlıktan sonra yeni bir başlık göründüğünde önceki bölüm tamamlanmış
+    sayılır ve raporu_ayir'in vereceği içerikle bir kez bildirilir.
+    """
 
-def full_stream(link):
-    cv_text = test_llama_parse(link).strip()
+    def __init__(self, on_section):
+        self.on_section = on_section
+        self.text = ""
+        self.emitted = set()
+
+    def _emit(self, sections):
+        for title, content in sections:
+            if title not in self.emitted:
+                self.emitted.add(title)
+                self.on_section(title, content)
+
+    def feed(self, text):
+        self.text += text
+        # Yeni başlık ancak '**' ile kapanabilir; diğer token'larda yeniden ayrıştırmaya gerek yok
+        if "*" not in text:
+            return
+        sections = list(raporu_ayir(extract_report(self.text)).items())
+        self._emit(sections[:-1])
+
+    def finish(self):
+        sections = raporu_ayir(extract_report(self.text))
+        self._emit(sections.items())
+        return sections
+
+# Model import sırasında değil, ilk istekte yüklenir (bkz. model_manager)
+model_manager = get_model_manager()
 
-    prompt = f"""
+# Her istekte aynı kalan talimat bloğu; KV cache'i bir kez hesaplanıp yeniden kullanılır
+PROMPT_PREFIX = """
 You are an expert career counsellor and CV analyst.
 
 Carefully analyze the CV and provide a detailed, structured report with the sections below:
@@ -91,23 +116,202 @@ Carefully analyze the CV and provide a detailed, structured report with the sect
 9. CV Score (out of 100)
 
 CV to analyze:
-{cv_text}
+"""
+
+PROMPT_SUFFIX = """
 
 Write the output in a clean format. Start with: "Report:"
 """
 
-    inputs = tokenizer(prompt, return_tensors="pt").to(device)
+CV_PREFIX_CACHE = os.getenv("CV_PREFIX_CACHE", "1") == "1"
+
+
+def build_prompt(cv_text):
+    return PROMPT_PREFIX + cv_text + PROMPT_SUFFIX
 
+
+def encode_prefix(model, tokenizer, device):
+    """Sabit talimat ön ekini bir kez modelden geçir; (token id'leri, past_key_values) döndür"""
+    import torch
+
+    prefix_ids = tokenizer(PROMPT_PREFIX, return_tensors="pt").input_ids.to(device)
     with torch.no_grad():
-        output_tokens = model.generate(
-            **inputs,
-            max_new_tokens=900,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9
-        )
-
-    output_text = tokenizer.decode(output_tokens[0], skip_special_tokens=True)
+        out = model(input_ids=prefix_ids, use_cache=True)
+    return prefix_ids, out.past_key_values
+
+
+def prefix_cached_inputs(prompts, model, tokenizer, device):
+    """
+    Ön eki paylaşılan prompt'lar için generate girdilerini hazırla.
+
+    Satırlar [ön ek][dolgu][CV + son ek] şeklinde dizilir; dolgu ortada kaldığı
+    için ön ekin KV cache'i her satırda aynı pozisyonlarda geçerli kalır ve
+    her CV yalnızca kendi metninin prefill maliyetini öder.
+    """
+    import copy
+    import torch
+
+    prefix_ids, prefix_cache = model_manager.cached(
+        "prompt_prefix", lambda: encode_prefix(model, tokenizer, device)
+    )
+    tails = [prompt[len(PROMPT_PREFIX):] for prompt in prompts]
+    tail_ids = tokenizer(tails, add_special_tokens=False).input_ids
+    width = max(len(ids) for ids in tail_ids)
+
+    input_ids = torch.full((len(prompts), width), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(prompts), width), dtype=torch.long)
+    for row, ids in enumerate(tail_ids):
+        input_ids[row, width - len(ids):] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, width - len(ids):] = 1
+
+    batch_prefix = prefix_ids.expand(len(prompts), -1)
+    # generate cache'i yerinde büyüttüğü için her çağrı kendi kopyasını alır
+    cache = copy.deepcopy(prefix_cache)
+    if len(prompts) > 1:
+        cache.batch_repeat_interleave(len(prompts))
+    return {
+        "input_ids": torch.cat([batch_prefix, input_ids.to(device)], dim=1),
+        "attention_mask": torch.cat([torch.ones_like(batch_prefix), attention_mask.to(device)], dim=1),
+        "past_key_values": cache,
+    }
+
+
+class BatchTextStreamer:
+    """
+    generate için batch destekli token streamer'ı (transformers BaseStreamer arayüzü).
+
+    Her satırın yeni token'larını ayrı ayrı decode eder ve eklenen metni o
+    satırın callback'ine iletir; callback'i None olan satırlar atlanır.
+    """
+
+    def __init__(self, tokenizer, callbacks):
+        self.tokenizer = tokenizer
+        self.callbacks = callbacks
+        self.tokens = [[] for _ in callbacks]
+        self.sent = [0] * len(callbacks)
+        self.finished = [callback is None for callback in callbacks]
+        self.prompt_seen = False
+
+    def put(self, value):
+        # İlk çağrı prompt token'larıdır
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+        for row, token in enumerate(value.reshape(len(self.callbacks), -1).tolist()):
+            if self.finished[row]:
+                continue
+            self.tokens[row].extend(token)
+            if self.tokenizer.eos_token_id in token:
+                self.finished[row] = True
+            self._flush(row, final=self.finished[row])
+
+    def _flush(self, row, final=False):
+        text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+        # Yarım kalmış çok baytlı karakteri bir sonraki token'a kadar beklet
+        if not final and text.endswith("\ufffd"):
+            return
+        if len(text) > self.sent[row]:
+            self.callbacks[row](text[self.sent[row]:])
+            self.sent[row] = len(text)
+
+    def end(self):
+        for row, callback in enumerate(self.callbacks):
+            if callback is not None:
+                self._flush(row, final=True)
+
+
+def cancel_criteria(should_stop):
+    """
+    Satır bazında iptal için StoppingCriteria: iptal edilen satır bitmiş sayılır,
+    tüm satırlar bittiğinde generate erken döner.
+    """
+    import torch
+    from transformers import StoppingCriteria
+
+    class CancelledRows(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            flags = [check is not None and check() for check in should_stop]
+            return torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+
+    return CancelledRows()
+
+
+def generate_reports(prompts, max_new_tokens=900, on_text=None, should_stop=None):
+    """
+    Prompt listesini tek bir batched generate çağrısıyla üret.
+
+    Tüm prompt'lar sabit talimat ön ekiyle başlıyorsa ön ekin KV cache'i
+    yeniden kullanılır; aksi halde prompt'lar sola dolgulanır. Her satırdan
+    yalnızca yeni üretilen token'lar decode edilip aynı sırayla döndürülür.
+    on_text verilirse (satır başına callback ya da None) üretilen metin akış
+    halinde iletilir; should_stop True döndüren satırların üretimi durdurulur.
+    """
+    import torch
+    from transformers import StoppingCriteriaList
+
+    with model_manager.use() as (model, tokenizer, device):
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        if CV_PREFIX_CACHE and all(prompt.startswith(PROMPT_PREFIX) for prompt in prompts):
+            inputs = prefix_cached_inputs(prompts, model, tokenizer, device)
+        else:
+            tokenizer.padding_side = "left"
+            inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(device)
+
+        streamer = None
+        if on_text is not None and any(callback is not None for callback in on_text):
+            streamer = BatchTextStreamer(tokenizer, on_text)
+
+        stopping_criteria = None
+        if should_stop is not None and any(check is not None for check in should_stop):
+            stopping_criteria = StoppingCriteriaList([cancel_criteria(should_stop)])
+
+        with torch.no_grad():
+            output_tokens = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=True,
+                temperature=0.7,
+                top_p=0.9,
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=streamer,
+                stopping_criteria=stopping_criteria
+            )
+
+        new_tokens = output_tokens[:, inputs["input_ids"].shape[1]:]
+        return tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+
+# Eşzamanlı CV'ler kısa bir pencerede toplanıp tek generate çağrısında üretilir
+batch_scheduler = BatchScheduler(generate_reports)
+
+
+def full_stream(link, on_text=None, on_section=None, should_stop=None):
+    """
+    CV'yi ayrıştırıp raporu üret. on_text üretilen metni token token,
+    on_section (başlık, içerik) tamamlanan bölümleri akış halinde alır.
+    should_stop True döndürürse (istek iptal edildi) iş TaskCancelled ile biter.
+    """
+    cv_text = test_llama_parse(link).strip()
+    if should_stop is not None and should_stop():
+        raise TaskCancelled("İstek iptal edildi")
+
+    tracker = SectionTracker(on_section) if on_section is not None else None
+
+    def stream_text(text):
+        if on_text is not None:
+            on_text(text)
+        if tracker is not None:
+            tracker.feed(text)
+
+    streaming = on_text is not None or tracker is not None
+    output_text = batch_scheduler.generate(
+        build_prompt(cv_text), on_text=stream_text if streaming else None, should_stop=should_stop
+    )
+    if should_stop is not None and should_stop():
+        raise TaskCancelled("İstek iptal edildi")
+    if tracker is not None:
+        tracker.finish()
     report = extract_report(output_text)
     print(report)
     return raporu_ayir(report)
@@ -0,0 +1,397 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cv_mechanism.batching import CV_MAX_BATCH_SIZE
+from cv_mechanism.model_manager import CV_MODEL_PRELOAD
+
+# Aynı anda çalışan CV çıkarım süreci sayısı (her süreç kendi modelini tutar)
+CV_WORKERS = int(os.getenv("CV_WORKERS", "1"))
+# Hazır olmadan üst üste bu kadar kez çöken worker'lar yeniden başlatılmaz; bekleyen istekler hata alır
+CV_WORKER_MAX_BOOT_FAILURES = int(os.getenv("CV_WORKER_MAX_BOOT_FAILURES", "3"))
+# Tek bir CV isteği için en uzun bekleme süresi (sn)
+CV_REQUEST_TIMEOUT = float(os.getenv("CV_REQUEST_TIMEOUT", "900"))
+# İptal bayrakları için paylaşılan bellek; görev id'si mod bu sayı ile eşlenir
+CANCEL_SLOTS = 65536
+# Worker'ların canlılığı olay trafiğinden bağımsız olarak bu aralıkla (sn) kontrol edilir
+CV_WORKER_CHECK_SECONDS = 1.0
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _remove_upload(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _worker_main(worker_id, tasks, events, cancelled, claims, slot_count, preload):
+    """
+    Worker süreci: görevleri sıradan alır, full_stream'i çalıştırır, sonucu geri yollar.
+
+    slot_count kadar görev aynı anda işlenir; böylece eşzamanlı CV'ler batch
+    zamanlayıcısında tek generate çağrısına birleşebilir. Kuyruktan alınan görev
+    id'si hemen paylaşılan claims dizisine yazılır: worker "started" olayını
+    gönderemeden çökse bile havuz görevi bulup hata ile sonlandırabilir.
+    """
+    # torch / transformers yalnızca worker sürecinde import edilir
+    from cv_mechanism import converter
+
+    manager = converter.model_manager
+    manager.on_state_change = lambda status: events.put(("state", worker_id, status))
+    events.put(("state", worker_id, manager.status()))
+    if preload:
+        manager.preload()
+
+    # Boş slot indeksleri; claims[worker_id * slot_count + slot] o slottaki görevdir
+    free_slots = queue.Queue()
+    for slot in range(slot_count):
+        free_slots.put(slot)
+
+    def release(slot):
+        claims[worker_id * slot_count + slot] = 0
+        free_slots.put(slot)
+
+    def run(slot, task_id, link, stream, cleanup):
+        # İptal edilen (zaman aşımı / istemci ayrıldı) görev hiç çalıştırılmaz
+        if cancelled[task_id % CANCEL_SLOTS]:
+            events.put(("error", task_id, "İstek iptal edildi"))
+            release(slot)
+            if cleanup:
+                _remove_upload(link)
+            return
+        # İptal bayrağı üretim sırasında da izlenir; iptal edilen satır batch'te erken durur
+        options = {"should_stop": lambda: bool(cancelled[task_id % CANCEL_SLOTS])}
+        if stream:
+            options["on_text"] = lambda text: events.put(("token", task_id, text))
+            options["on_section"] = lambda title, content: events.put(("section", task_id, (title, content)))
+        try:
+            events.put(("done", task_id, converter.full_stream(link, **options)))
+        except Exception as e:
+            events.put(("error", task_id, f"{type(e).__name__}: {e}"))
+        finally:
+            release(slot)
+            # Yüklenen dosya görevin sahipliğinde; işi biten worker siler
+            if cleanup:
+                _remove_upload(link)
+
+    with ThreadPoolExecutor(slot_count) as executor:
+        while True:
+            # Boş slot yokken kuyruktan iş alma; diğer worker'lar alabilsin
+            slot = free_slots.get()
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, link, stream, cleanup = task
+            claims[worker_id * slot_count + slot] = task_id
+            events.put(("started", worker_id, task_id))
+            executor.submit(run, slot, task_id, link, stream, cleanup)
+
+
+class CVInferencePool:
+    """
+    CV analizini API sürecinin dışında çalıştıran worker havuzu.
+
+    İstekler IPC kuyruğu üzerinden worker süreçlerine dağıtılır; API tarafı
+    yalnızca Future bekler, böylece event loop model.generate sırasında
+    bloklanmaz. Eşzamanlılık worker sayısıyla sınırlanır, fazlası kuyrukta bekler.
+    """
+
+    def __init__(self, workers=CV_WORKERS, preload=False):
+        self.workers = max(1, workers)
+        # Her worker batch boyutu kadar CV'yi birlikte işler
+        self.slots_per_worker = max(1, CV_MAX_BATCH_SIZE)
+        self.concurrency = self.workers * self.slots_per_worker
+        self.preload = preload
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = None
+        self._events = None
+        self._processes = {}
+        self._running = {}
+        self._worker_states = {}
+        self._pending = {}
+        self._on_start = {}
+        self._on_stream = {}
+        self._task_info = {}
+        self._booted = {}
+        self._boot_failures = 0
+        self._broken = None
+        self._cancelled = None
+        self._claims = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            if self._dispatcher is not None:
+                return
+            self._stopping = False
+            self._tasks = self._ctx.Queue()
+            self._events = self._ctx.Queue()
+            self._cancelled = self._ctx.RawArray("b", CANCEL_SLOTS)
+            self._claims = self._ctx.RawArray("q", self.concurrency)
+            for worker_id in range(self.workers):
+                self._spawn(worker_id)
+            self._dispatcher = threading.Thread(target=self._dispatch, name="cv-dispatcher", daemon=True)
+            self._dispatcher.start()
+        print(f"✅ CV çıkarım havuzu başlatıldı ({self.workers} worker)")
+
+    def _worker_claims(self, worker_id):
+        """Worker'ın kuyruktan aldığı (henüz bitmemiş) görev id'leri"""
+        base = worker_id * self.slots_per_worker
+        return {task_id for task_id in self._claims[base:base + self.slots_per_worker] if task_id}
+
+    def _spawn(self, worker_id):
+        base = worker_id * self.slots_per_worker
+        self._claims[base:base + self.slots_per_worker] = [0] * self.slots_per_worker
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._tasks, self._events, self._cancelled, self._claims,
+                  self.slots_per_worker, self.preload),
+            name=f"cv-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._running.pop(worker_id, None)
+        # İlk durum mesajını gönderene kadar worker açılmamış sayılır
+        self._booted[worker_id] = False
+
+    def _dispatch(self):
+        next_check = time.monotonic() + CV_WORKER_CHECK_SECONDS
+        while not self._stopping:
+            # Akış olayları sürekli gelse de çöken worker'lar zamanında fark edilsin
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + CV_WORKER_CHECK_SECONDS
+            try:
+                event = self._events.get(timeout=max(0.0, next_check - time.monotonic()))
+            except queue.Empty:
+                continue
+
+            kind = event[0]
+            if kind == "state":
+                with self._lock:
+                    self._worker_states[event[1]] = event[2]
+                    self._booted[event[1]] = True
+                    self._boot_failures = 0
+            elif kind == "started":
+                with self._lock:
+                    self._running.setdefault(event[1], set()).add(event[2])
+                    callback = self._on_start.pop(event[2], None)
+                if callback is not None:
+                    callback()
+            elif kind in ("token", "section"):
+                callback = self._on_stream.get(event[1])
+                if callback is not None:
+                    callback(kind, event[2])
+            elif kind in ("done", "error"):
+                task_id = event[1]
+                with self._lock:
+                    future = self._pending.pop(task_id, None)
+                    self._on_start.pop(task_id, None)
+                    self._on_stream.pop(task_id, None)
+                    self._task_info.pop(task_id, None)
+                    for running_ids in self._running.values():
+                        running_ids.discard(task_id)
+                if future is None:
+                    continue
+                if kind == "done":
+                    future.set_result(event[2])
+                else:
+                    future.set_exception(RuntimeError(event[2]))
+
+    def _fail_task(self, task_id, error):
+        """Görevi bekleyenleri hata ile sonlandır (kilit tutulurken çağrılır)"""
+        self._on_start.pop(task_id, None)
+        self._on_stream.pop(task_id, None)
+        # Kuyrukta kalmışsa worker'lar atlasın
+        self._cancelled[task_id % CANCEL_SLOTS] = 1
+        link, cleanup = self._task_info.pop(task_id, (None, False))
+        if cleanup:
+            _remove_upload(link)
+        future = self._pending.pop(task_id, None)
+        if future is not None:
+            future.set_exception(error)
+
+    def _check_workers(self):
+        """
+        Çöken worker'ın işlerini hata ile sonlandır ve yerine yenisini başlat.
+
+        Hazır olmadan üst üste CV_WORKER_MAX_BOOT_FAILURES kez çöken worker'lar
+        (ör. eksik bağımlılık) yeniden başlatılmaz; bekleyen tüm istekler hata
+        alır ve havuz bir sonraki submit'e kadar bekler.
+        """
+        with self._lock:
+            if self._broken or self._stopping:
+                return
+            for worker_id, process in list(self._processes.items()):
+                if process.is_alive():
+                    continue
+                print(f"⚠️ CV worker {worker_id} beklenmedik şekilde kapandı (exit={process.exitcode})")
+                # "started" gönderilmeden çöküldüyse görev yalnızca claims'te görünür
+                lost = self._running.pop(worker_id, set()) | self._worker_claims(worker_id)
+                for task_id in lost:
+                    if task_id in self._task_info:
+                        self._fail_task(task_id, WorkerCrashed(f"CV worker {worker_id} çöktü"))
+                self._worker_states.pop(worker_id, None)
+                if not self._booted.get(worker_id):
+                    self._boot_failures += 1
+                if self._boot_failures >= CV_WORKER_MAX_BOOT_FAILURES:
+                    self._broken = f"CV worker'ları başlatılamıyor ({self._boot_failures} başarısız deneme, exit={process.exitcode})"
+                    print(f"❌ {self._broken}; bekleyen istekler iptal ediliyor")
+                    for task_id in list(self._pending):
+                        self._fail_task(task_id, WorkerCrashed(self._broken))
+                    return
+                self._spawn(worker_id)
+
+    def _revive(self):
+        """Başlatılamayan havuzu yeni bir istek geldiğinde bir kez daha dene (kilit tutulurken çağrılır)"""
+        if not self._broken:
+            return
+        print("🔁 CV worker'ları yeniden başlatılıyor")
+        self._broken = None
+        self._boot_failures = 0
+        for worker_id, process in list(self._processes.items()):
+            if not process.is_alive():
+                self._spawn(worker_id)
+
+    def submit(self, link, on_start=None, on_stream=None, cleanup=False):
+        """
+        PDF yolunu kuyruğa ekle; sonuç (bölüm → metin sözlüğü) Future olarak döner.
+        on_start verilirse bir worker işi almaya başladığında çağrılır; on_stream
+        verilirse üretim sırasında ("token", metin) ve ("section", (başlık, içerik))
+        olaylarını alır. cleanup=True ise dosya görev bitince (iptal dahil) silinir.
+        Future'ın task_id alanı cancel() için kullanılır.
+        """
+        self.start()
+        future = Future()
+        with self._lock:
+            self._revive()
+            task_id = next(self._ids)
+            future.task_id = task_id
+            self._pending[task_id] = future
+            self._task_info[task_id] = (link, cleanup)
+            self._cancelled[task_id % CANCEL_SLOTS] = 0
+            if on_start is not None:
+                self._on_start[task_id] = on_start
+            if on_stream is not None:
+                self._on_stream[task_id] = on_stream
+        self._tasks.put((task_id, link, on_stream is not None, cleanup))
+        return future
+
+    def cancel(self, task_id):
+        """
+        Görevi iptal et: bekleyen Future iptal edilir, kuyruktaki görev worker'da
+        atlanır. Dosya görevin sahipliğinde kalır ve worker tarafından silinir.
+        """
+        with self._lock:
+            future = self._pending.pop(task_id, None)
+            self._on_start.pop(task_id, None)
+            self._on_stream.pop(task_id, None)
+            if self._cancelled is not None:
+                self._cancelled[task_id % CANCEL_SLOTS] = 1
+        if future is not None:
+            future.cancel()
+
+    async def run(self, link, timeout=CV_REQUEST_TIMEOUT, cleanup=False):
+        future = self.submit(link, cleanup=cleanup)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.cancel(future.task_id)
+            raise
+
+    async def stream(self, link, timeout=CV_REQUEST_TIMEOUT, cleanup=False):
+        """
+        Üretimi akış halinde izle: ("token", metin) ve ("section", (başlık, içerik))
+        olaylarını, en sonda da ("result", bölüm sözlüğü) döndürür. Akış sonuç
+        gelmeden kapanırsa (istemci ayrıldı) ya da timeout dolarsa
+        (asyncio.TimeoutError) görev iptal edilir.
+        """
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+        closed = False
+
+        def forward(kind, data):
+            # İstemci ayrıldıysa olayları bırak
+            if not closed:
+                loop.call_soon_threadsafe(updates.put_nowait, (kind, data))
+
+        future = self.submit(link, on_stream=forward, cleanup=cleanup)
+        future.add_done_callback(lambda _: forward("end", None))
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                kind, data = await asyncio.wait_for(updates.get(), max(0.0, deadline - loop.time()))
+                if kind == "end":
+                    break
+                yield kind, data
+            yield "result", future.result()
+        finally:
+            closed = True
+            if not future.done():
+                self.cancel(future.task_id)
+
+    def stop(self, timeout=10):
+        with self._lock:
+            if self._dispatcher is None:
+                return
+            self._stopping = True
+            for _ in self._processes:
+                self._tasks.put(None)
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._dispatcher.join(timeout)
+        with self._lock:
+            for future in self._pending.values():
+                future.set_exception(WorkerCrashed("CV çıkarım havuzu kapatıldı"))
+            self._pending.clear()
+            self._on_start.clear()
+            self._on_stream.clear()
+            self._task_info.clear()
+            self._booted.clear()
+            self._broken = None
+            self._boot_failures = 0
+            self._processes.clear()
+            self._running.clear()
+            self._worker_states.clear()
+            self._dispatcher = None
+
+    def status(self):
+        with self._lock:
+            running = sum(len(ids) for ids in self._running.values())
+            return {
+                "started": self._dispatcher is not None,
+                "workers": self.workers,
+                "concurrency": self.concurrency,
+                "alive_workers": sum(p.is_alive() for p in self._processes.values()),
+                "running": running,
+                "queued": max(0, len(self._pending) - running),
+                "ready": any(s.get("ready") for s in self._worker_states.values()),
+                "error": self._broken,
+                "models": [self._worker_states[w] for w in sorted(self._worker_states)],
+            }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_inference_pool():
+    """Süreç genelinde paylaşılan CV çıkarım havuzu"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = CVInferencePool(preload=CV_MODEL_PRELOAD)
+        return _default_pool
@@ -0,0 +1,289 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+CV_JOB_DB_PATH = os.getenv("CV_JOB_DB_PATH", "./cv_jobs.sqlite3")
+CV_UPLOAD_DIR = os.getenv("CV_UPLOAD_DIR", "./cv_uploads")
+# Biten işler bu kadar saniye saklanır, tablo en fazla bu kadar satır tutar
+CV_JOB_RETENTION_SECONDS = int(os.getenv("CV_JOB_RETENTION_SECONDS", "86400"))
+CV_JOB_MAX_ROWS = int(os.getenv("CV_JOB_MAX_ROWS", "1000"))
+# Henüz biten iş yokken ETA için kullanılan varsayılan süre (sn)
+CV_JOB_DEFAULT_SECONDS = float(os.getenv("CV_JOB_DEFAULT_SECONDS", "120"))
+# İşin sahibi olan API süreci bu kadar saniye heartbeat göndermezse iş başka bir sürece devredilir
+CV_JOB_LEASE_SECONDS = float(os.getenv("CV_JOB_LEASE_SECONDS", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class CVJobStore:
+    """CV analiz işlerinin kalıcı tablosu (SQLite); süreç yeniden başlasa da işler korunur"""
+
+    def __init__(self, path=CV_JOB_DB_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cv_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, path TEXT, "
+            "created_at REAL, started_at REAL, finished_at REAL, result TEXT, error TEXT, "
+            "owner TEXT, heartbeat REAL)"
+        )
+        # Sahiplik kolonları olmadan oluşturulmuş eski tablolar
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(cv_jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE cv_jobs ADD COLUMN {column} {kind}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cv_jobs_status ON cv_jobs (status, created_at)")
+        self._db.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+        return cursor.rowcount
+
+    def create(self, job_id, filename, path, owner):
+        now = time.time()
+        self._execute(
+            "INSERT INTO cv_jobs (id, status, filename, path, created_at, owner, heartbeat) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, filename, path, now, owner, now)
+        )
+
+    def claim(self, job_id, owner, lease_seconds=CV_JOB_LEASE_SECONDS):
+        """
+        Sahipsiz ya da kirası dolmuş yarım işi atomik olarak sahiplen ve kuyruğa geri al.
+        Aynı işi iki süreç aynı anda sahiplenmeye çalışırsa yalnızca biri True alır.
+        """
+        now = time.time()
+        return self._execute(
+            "UPDATE cv_jobs SET status = ?, started_at = NULL, owner = ?, heartbeat = ? "
+            "WHERE id = ? AND status IN (?, ?) AND (owner IS NULL OR heartbeat < ?)",
+            (QUEUED, owner, now, job_id, QUEUED, RUNNING, now - lease_seconds)
+        ) == 1
+
+    def heartbeat(self, owner):
+        """Sürecin sahip olduğu bitmemiş işlerin kirasını uzat"""
+        self._execute(
+            "UPDATE cv_jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+            (time.time(), owner, QUEUED, RUNNING)
+        )
+
+    def release(self, owner):
+        """Kapanan sürecin bitmemiş işlerini bırak; diğer süreçler kira dolmasını beklemeden alır"""
+        self._execute(
+            "UPDATE cv_jobs SET owner = NULL WHERE owner = ? AND status IN (?, ?)",
+            (owner, QUEUED, RUNNING)
+        )
+
+    def mark_running(self, job_id):
+        self._execute("UPDATE cv_jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+
+    def mark_done(self, job_id, result):
+        self._execute(
+            "UPDATE cv_jobs SET status = ?, finished_at = ?, result = ? WHERE id = ?",
+            (DONE, time.time(), json.dumps(result, ensure_ascii=False), job_id)
+        )
+
+    def mark_failed(self, job_id, error):
+        self._execute(
+            "UPDATE cv_jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+            (FAILED, time.time(), error, job_id)
+        )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM cv_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def orphaned(self, lease_seconds=CV_JOB_LEASE_SECONDS):
+        """Sahibi olmayan ya da sahibinin kirası dolmuş bitmemiş işler (id, path)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, path FROM cv_jobs WHERE status IN (?, ?) AND (owner IS NULL OR heartbeat < ?) "
+                "ORDER BY created_at",
+                (QUEUED, RUNNING, time.time() - lease_seconds)
+            ).fetchall()
+        return [(row["id"], row["path"]) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM cv_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def queued_before(self, created_at):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM cv_jobs WHERE status = ? AND created_at < ?", (QUEUED, created_at)
+            ).fetchone()
+        return row[0]
+
+    def average_duration(self, last_n=20):
+        """Son biten işlerin ortalama çalışma süresi (sn); hiç yoksa None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM cv_jobs "
+                "WHERE status = ? AND started_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)",
+                (DONE, last_n)
+            ).fetchone()
+        return row[0]
+
+    def purge(self, retention_seconds=CV_JOB_RETENTION_SECONDS, max_rows=CV_JOB_MAX_ROWS):
+        """Süresi dolan ve sınırı aşan biten işleri (ve yüklenen dosyalarını) sil"""
+        with self._lock:
+            expired = self._db.execute(
+                "SELECT id, path FROM cv_jobs WHERE status IN (?, ?) AND "
+                "(finished_at < ? OR id NOT IN (SELECT id FROM cv_jobs ORDER BY created_at DESC LIMIT ?))",
+                (DONE, FAILED, time.time() - retention_seconds, max_rows)
+            ).fetchall()
+            self._db.executemany("DELETE FROM cv_jobs WHERE id = ?", [(row["id"],) for row in expired])
+            self._db.commit()
+        for row in expired:
+            _remove_file(row["path"])
+        return len(expired)
+
+
+def _remove_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+class CVJobService:
+    """
+    Yüklenen CV'yi hemen kabul edip iş kimliği döndüren kuyruk.
+
+    İşler çıkarım havuzunun kaldırabildiği hızda işlenir; durum, kuyruk
+    sırası ve tahmini bitiş süresi iş tablosundan okunur.
+
+    Birden fazla API süreci aynı tabloyu paylaşabilir: her iş onu kuyruğa alan
+    sürecin sahipliğindedir (owner + heartbeat). Süreç ölür ya da kapanırsa kirası
+    dolan işler diğer süreçlerden biri tarafından atomik olarak sahiplenilir.
+    """
+
+    def __init__(self, pool, store=None, upload_dir=CV_UPLOAD_DIR, lease_seconds=CV_JOB_LEASE_SECONDS):
+        self.pool = pool
+        self.store = store or CVJobStore()
+        self.upload_dir = upload_dir
+        self.lease_seconds = lease_seconds
+        # pid tek başına yeniden kullanılabilir; yeniden başlayan süreç eski işlere sahip çıkmasın
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stopped = threading.Event()
+        self._heartbeat = None
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def submit(self, filename, data):
+        self.store.purge()
+        job_id = uuid.uuid4().hex
+        path = os.path.abspath(os.path.join(self.upload_dir, f"{job_id}.pdf"))
+        with open(path, "wb") as f:
+            f.write(data)
+        self.store.create(job_id, filename, path, self.owner)
+        self._enqueue(job_id, path)
+        return self.status(job_id)
+
+    def _enqueue(self, job_id, path):
+        future = self.pool.submit(path, on_start=lambda: self.store.mark_running(job_id))
+
+        def finished(future):
+            # Süreç kapanırken havuz bekleyen işleri hata ile bitirir; bu işler
+            # başarısız sayılmaz, bırakılan kira ile başka bir süreçte devam eder
+            if self._stopped.is_set():
+                return
+            try:
+                self.store.mark_done(job_id, future.result())
+            except Exception as e:
+                self.store.mark_failed(job_id, str(e))
+            # Sonuç tabloda; yüklenen PDF'e artık gerek yok
+            _remove_file(path)
+
+        future.add_done_callback(finished)
+
+    def resume(self):
+        """
+        Kirası dolmuş (sahibi ölmüş) yarım işleri sahiplenip yeniden kuyruğa al;
+        dosyası kaybolanları başarısız say. Heartbeat thread'ini de başlatır.
+        """
+        self._start_heartbeat()
+        resumed = 0
+        for job_id, path in self.store.orphaned(self.lease_seconds):
+            if not self.store.claim(job_id, self.owner, self.lease_seconds):
+                # Başka bir süreç daha önce sahiplendi
+                continue
+            if path and os.path.exists(path):
+                self._enqueue(job_id, path)
+                resumed += 1
+            else:
+                self.store.mark_failed(job_id, "Yüklenen dosya bulunamadı (sunucu yeniden başlatıldı)")
+        if resumed:
+            print(f"🔁 {resumed} yarım kalan CV işi yeniden kuyruğa alındı")
+        return resumed
+
+    def _start_heartbeat(self):
+        if self._heartbeat is not None:
+            return
+
+        def run():
+            # Kendi işlerinin kirasını uzat, ölen süreçlerin işlerini devral
+            while not self._stopped.wait(self.lease_seconds / 3):
+                try:
+                    self.store.heartbeat(self.owner)
+                    self.resume()
+                except Exception as e:
+                    print(f"⚠️ CV iş kirası yenilenemedi: {e}")
+
+        self._heartbeat = threading.Thread(target=run, name="cv-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def stop(self):
+        """Heartbeat'i durdur ve bitmemiş işleri diğer süreçlere bırak"""
+        self._stopped.set()
+        self.store.release(self.owner)
+
+    def _job_seconds(self):
+        return self.store.average_duration() or CV_JOB_DEFAULT_SECONDS
+
+    def queue_info(self):
+        counts = self.store.counts()
+        return {
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "workers": self.pool.workers,
+            "concurrency": self.pool.concurrency,
+            "average_job_seconds": round(self._job_seconds(), 1),
+        }
+
+    def status(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+
+        info = {
+            "job_id": job_id,
+            "status": job["status"],
+            "filename": job["filename"],
+            "created_at": job["created_at"],
+            "queue_position": None,
+            "queue_length": self.store.counts().get(QUEUED, 0),
+            "eta_seconds": None,
+            "error": job["error"],
+        }
+        per_job = self._job_seconds()
+        if job["status"] == QUEUED:
+            # Önündeki işler havuzun eşzamanlılığı kadar paralel işlenir, ardından bu iş çalışır
+            position = self.store.queued_before(job["created_at"])
+            info["queue_position"] = position + 1
+            info["eta_seconds"] = round((math.floor(position / self.pool.concurrency) + 1) * per_job, 1)
+        elif job["status"] == RUNNING:
+            info["eta_seconds"] = round(max(0.0, per_job - (time.time() - job["started_at"])), 1)
+        return info
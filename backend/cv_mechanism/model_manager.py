@@ -0,0 +1,244 @@
+import gc
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+CV_MODEL_NAME = os.getenv("CV_MODEL_NAME", "Geetansh007/Counsellor")
+# Açılışta modeli arka planda yükle (CV işleyen worker'lar için)
+CV_MODEL_PRELOAD = os.getenv("CV_MODEL_PRELOAD", "0") == "1"
+# Bu kadar saniye kullanılmayan model bellekten atılır (0: hiç atma)
+CV_MODEL_IDLE_SECONDS = int(os.getenv("CV_MODEL_IDLE_SECONDS", "900"))
+# fp32 | bf16 | int8 (int8: Linear katmanlarına dinamik quantization, yalnızca CPU).
+# int8, torch.ao.quantization.quantize_dynamic kullanır; bu API torch'ta deprecated
+# (yerini torchao alıyor). Kaldırıldığı sürümlerde int8 isteği fp32'ye düşer.
+CV_MODEL_PRECISION = os.getenv("CV_MODEL_PRECISION", "fp32")
+# torch intra-op thread sayısı (0: torch varsayılanı); kutu başına birden fazla worker için düşürün
+CV_TORCH_THREADS = int(os.getenv("CV_TORCH_THREADS", "0"))
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+COLD = "cold"
+LOADING = "loading"
+WARM = "warm"
+FAILED = "failed"
+
+
+class CounsellorModelManager:
+    """
+    Counsellor modelini ihtiyaç anında yükleyen yönetici.
+
+    Model import sırasında değil, ilk CV isteğinde (ya da preload ile arka
+    planda) yüklenir. Belirli bir süre kullanılmazsa bellekten atılır ve
+    durum tekrar 'cold' olur; bir sonraki istek modeli yeniden yükler.
+    """
+
+    def __init__(self, model_name=CV_MODEL_NAME, idle_seconds=CV_MODEL_IDLE_SECONDS,
+                 precision=CV_MODEL_PRECISION, threads=CV_TORCH_THREADS):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Geçersiz hassasiyet: {precision} (seçenekler: {', '.join(PRECISIONS)})")
+        self.model_name = model_name
+        self.idle_seconds = idle_seconds
+        self.precision = precision
+        self.threads = threads
+        self.state = COLD
+        self.error = None
+        self.device = None
+        self.active_precision = None
+        self.load_seconds = None
+        self._model = None
+        self._tokenizer = None
+        # Modele bağlı türetilmiş veriler (ör. prompt ön eki KV cache'i); model atılınca silinir
+        self._derived = {}
+        self._active = 0
+        self._last_used = time.monotonic()
+        self._lock = threading.RLock()
+        self._reaper = None
+        # Durum değişikliklerini dışarı bildirmek için (ör. worker → API süreci)
+        self.on_state_change = None
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_state_change is not None:
+            self.on_state_change(self.status())
+
+    def _load(self):
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        import torch
+
+        print(f"Model yükleniyor: {self.model_name}")
+        start = time.perf_counter()
+        self._set_state(LOADING)
+        try:
+            if self.threads > 0:
+                torch.set_num_threads(self.threads)
+            # Cihaz seçimi (GPU varsa kullan)
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            print("Kullanılan cihaz:", device)
+            precision = resolve_precision(self.precision, device)
+            dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModelForCausalLM.from_pretrained(self.model_name, torch_dtype=dtype).to(device)
+            model.eval()
+            if precision == "int8":
+                # Deprecation uyarıları her yüklemede tekrarlanmasın; durum CV_MODEL_PRECISION notunda
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", DeprecationWarning)
+                    model = quantize_dynamic()(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            self.error = str(e)
+            self._set_state(FAILED)
+            print(f"❌ Model yüklenemedi: {e}")
+            raise
+
+        self._model, self._tokenizer, self.device = model, tokenizer, device
+        self.active_precision = precision
+        self.load_seconds = time.perf_counter() - start
+        self.error = None
+        self._set_state(WARM)
+        self._last_used = time.monotonic()
+        print(f"✅ Model hazır ({self.load_seconds:.1f} sn, {precision})")
+        self._start_reaper()
+
+    def ensure_loaded(self):
+        with self._lock:
+            if self._model is None:
+                self._load()
+
+    @contextmanager
+    def use(self):
+        """Modeli kullanım süresince (model, tokenizer, device) olarak ver; bu sırada model atılmaz"""
+        with self._lock:
+            self.ensure_loaded()
+            self._active += 1
+            model, tokenizer, device = self._model, self._tokenizer, self.device
+        try:
+            yield model, tokenizer, device
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used = time.monotonic()
+
+    def cached(self, key, factory):
+        """Yüklü modele bağlı değeri bir kez hesapla; model bellekten atılana kadar sakla"""
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory()
+            return self._derived[key]
+
+    def preload(self):
+        """Modeli arka plan thread'inde yükle; hata olursa durum 'failed' olarak kalır"""
+        def run():
+            try:
+                self.ensure_loaded()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=run, name="cv-model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self):
+        """Modeli bellekten at (kullanımda değilse)"""
+        with self._lock:
+            if self._model is None or self._active:
+                return False
+            self._model = None
+            self._tokenizer = None
+            self._derived.clear()
+            self._set_state(COLD)
+
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        print("💤 CV modeli boşta kaldığı için bellekten atıldı")
+        return True
+
+    def _start_reaper(self):
+        if self.idle_seconds <= 0 or (self._reaper and self._reaper.is_alive()):
+            return
+
+        def run():
+            interval = min(self.idle_seconds, 30)
+            while True:
+                time.sleep(interval)
+                with self._lock:
+                    if self._model is None:
+                        return
+                    idle = time.monotonic() - self._last_used
+                    if self._active or idle < self.idle_seconds:
+                        continue
+                self.unload()
+                return
+
+        self._reaper = threading.Thread(target=run, name="cv-model-reaper", daemon=True)
+        self._reaper.start()
+
+    @property
+    def ready(self):
+        return self.state == WARM
+
+    def status(self):
+        return {
+            "model": self.model_name,
+            "state": self.state,
+            "ready": self.ready,
+            "device": str(self.device) if self.device is not None else None,
+            "precision": self.active_precision or self.precision,
+            "threads": self.threads or None,
+            "active_requests": self._active,
+            "idle_seconds": round(time.monotonic() - self._last_used, 1),
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+def resolve_precision(precision, device):
+    """İstenen hassasiyet cihazda desteklenmiyorsa fp32'ye düş"""
+    import torch
+
+    if precision == "int8" and device.type != "cpu":
+        print("⚠️ int8 dinamik quantization yalnızca CPU'da destekleniyor, fp32 kullanılacak")
+        return "fp32"
+    if precision == "int8" and quantize_dynamic() is None:
+        print("⚠️ Bu torch sürümünde torch.ao.quantization.quantize_dynamic yok, fp32 kullanılacak")
+        return "fp32"
+    if precision == "bf16":
+        if device.type == "cuda":
+            supported = torch.cuda.is_bf16_supported()
+        else:
+            # AVX512-BF16 / AMX yoksa bf16 CPU'da emüle edilir ve fp32'den yavaş çalışır
+            checks = ("_is_avx512_bf16_supported", "_is_amx_tile_supported")
+            supported = any(getattr(torch.cpu, name, lambda: False)() for name in checks)
+        if not supported:
+            print("⚠️ Bu cihaz bf16'yı donanımsal desteklemiyor, fp32 kullanılacak")
+            return "fp32"
+    return precision
+
+
+def quantize_dynamic():
+    """torch.ao.quantization.quantize_dynamic (deprecated API; kaldırılmışsa None)"""
+    import torch
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        quantization = getattr(torch.ao, "quantization", None)
+    return getattr(quantization, "quantize_dynamic", None)
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    """Süreç genelinde paylaşılan model yöneticisi"""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = CounsellorModelManager()
+        return _default_manager
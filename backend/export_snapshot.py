@@ -0,0 +1,37 @@
+import argparse
+import time
+
+import chromadb
+
+from retrieval.numpy_index import PRECISIONS, NumpyCourseIndex
+from retrieval.snapshot import export_snapshot, load_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChromaDB koleksiyonunu salt okunur, mmap'lenebilir snapshot olarak dışa aktar")
+    parser.add_argument("--db", default="./chroma_db", help="ChromaDB dizini")
+    parser.add_argument("--collection", default="courses", help="Dışa aktarılacak koleksiyon")
+    parser.add_argument("--out", default="./snapshots/courses",
+                        help="Güncel snapshot bağı; her export yanına yeni bir sürüm dizini yazar")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32",
+                        help="İlk geçiş araması için sıkıştırılmış kopya")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.db)
+    collection = client.get_collection(args.collection)
+
+    start = time.perf_counter()
+    index = NumpyCourseIndex.from_collection(collection).quantize(args.precision)
+    path = export_snapshot(index, args.out, manifest={
+        "collection": args.collection,
+        "embedding_backend": (collection.metadata or {}).get("embedding_backend"),
+    })
+    print(f"📦 {index.count()} kayıt '{path}' dizinine yazıldı ({time.perf_counter() - start:.1f} sn)")
+
+    start = time.perf_counter()
+    snapshot = load_snapshot(path)
+    print(f"⚡ Snapshot açılış süresi: {(time.perf_counter() - start) * 1000:.1f} ms ({snapshot.count()} kayıt)")
+
+
+if __name__ == "__main__":
+    main()
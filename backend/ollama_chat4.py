@@ -9,20 +9,34 @@ from langchain_community.llms import Ollama
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 
 import time
+import numpy as np
 import chromadb
-from chromadb.utils import embedding_functions
 from langchain_core.tools import tool
 
+from retrieval.embedding import backend_metadata, check_collection_backend, get_backend
+from retrieval.embedding_cache import CachedOllamaEmbeddingFunction, embed_queries
+from retrieval.filters import build_course_where
+from retrieval.hnsw_profiles import hnsw_metadata
+from retrieval.numpy_index import NumpyCourseIndex
+from retrieval.ranking import merge_query_results, mmr_select
+from retrieval.recommendation_table import RecommendationTable
+from retrieval.snapshot import load_snapshot, read_manifest
+
+# MMR'ın seçim yapabilmesi için n_results'ın bu katı kadar aday çekilir
+COURSE_MMR_FETCH_FACTOR = int(os.getenv("COURSE_MMR_FETCH_FACTOR", "4"))
+
 class GitHubProfileAnalyzer:
     """GitHub profil analizi yapan AI agent - ChromaDB ile kurs önerileri"""
     
     def __init__(self, github_token: Optional[str] = None, model_name: str = "llama3.1:8b", 
-                 chroma_path: str = "./chroma_db"):
+                 chroma_path: str = "./chroma_db", course_index_backend: Optional[str] = None):
         """
         Args:
             github_token: GitHub API token (opsiyonel, rate limit için önerilir)
             model_name: Ollama model adı (llama3.2, llama2, mistral vb.)
             chroma_path: ChromaDB veritabanı yolu
+            course_index_backend: Kurs arama backend'i: "chroma" (varsayılan) veya "numpy"
+                (bellek içi kesin arama). Verilmezse COURSE_INDEX_BACKEND ortam değişkeni kullanılır.
         """
         self.github_token = github_token
         self.headers = {"Authorization": f"token {github_token}"} if github_token else {}
@@ -41,7 +55,7 @@ class GitHubProfileAnalyzer:
         
         # ChromaDB ve embedding fonksiyonu başlat
         try:
-            self.embedding_fn = embedding_functions.OllamaEmbeddingFunction(
+            self.embedding_fn = CachedOllamaEmbeddingFunction(
                 model_name="nomic-embed-text",  # Ollama'da bulunan model
                 url="http://localhost:11434/api/embeddings"
             )
@@ -60,15 +74,64 @@ class GitHubProfileAnalyzer:
             except Exception:
                 self.courses_collection = self.chroma_client.create_collection(
                     name=collection_name,
-                    embedding_function=self.embedding_fn
+                    embedding_function=self.embedding_fn,
+                    metadata={**hnsw_metadata(), **backend_metadata()}
                 )
                 print(f"✅ ChromaDB '{collection_name}' koleksiyonu oluşturuldu")
+            
+            # Sorgu embedding'leri koleksiyonla aynı backend'den gelmeli
+            if not check_collection_backend(self.courses_collection):
+                print("💡 Koleksiyonu şu anki backend ile yeniden oluşturun: 'python add_to_rag.py --mode rebuild'")
+                self.courses_collection = None
                 
         except Exception as e:
             print(f"⚠️ ChromaDB bağlantı hatası: {e}")
             print("💡 ChromaDB'nin doğru yüklendiğinden emin olun")
             self.courses_collection = None
         
+        # Ingestion sırasında hazırlanan dil × seviye öneri tablosu (yoksa canlı arama yapılır)
+        try:
+            self.course_table = RecommendationTable.load()
+        except Exception as e:
+            print(f"⚠️ Kurs öneri tablosu yüklenemedi: {e}")
+            self.course_table = None
+        
+        # Kurs araması için backend (collection.query ile aynı arayüz)
+        self.course_search = self._init_course_search(
+            course_index_backend or os.getenv("COURSE_INDEX_BACKEND", "chroma")
+        )
+        
+    def _init_course_search(self, backend: str):
+        """Kurs arama backend'ini hazırla; numpy başarısız olursa ChromaDB'ye düş"""
+        if backend != "numpy":
+            return self.courses_collection
+        
+        try:
+            snapshot_path = os.getenv("COURSE_SNAPSHOT_PATH")
+            index_path = os.getenv("COURSE_INDEX_PATH")
+            # float16 / int8: ilk geçiş sıkıştırılmış matrisle, yeniden sıralama float32 ile.
+            # Ayarlanmamışsa snapshot kendi manifest'indeki hassasiyetle açılır.
+            precision = os.getenv("COURSE_INDEX_PRECISION")
+            if snapshot_path and os.path.exists(os.path.join(snapshot_path, "manifest.json")):
+                # Salt okunur snapshot: kopyasız mmap, sayfalar worker'lar arasında paylaşılır.
+                # Bağ bir kez çözülür ki manifest ve dosyalar aynı sürümden gelsin
+                snapshot_path = os.path.realpath(snapshot_path)
+                manifest_backend = read_manifest(snapshot_path).get("embedding_backend")
+                if manifest_backend and manifest_backend != get_backend().key:
+                    raise ValueError(f"snapshot '{manifest_backend}' backend'i ile oluşturulmuş")
+                index = load_snapshot(snapshot_path, precision=precision)
+            elif index_path and os.path.exists(index_path + ".npy"):
+                index = NumpyCourseIndex.load(index_path, mmap=True, precision=precision or "float32")
+            elif self.courses_collection is not None:
+                index = NumpyCourseIndex.from_collection(self.courses_collection).quantize(precision or "float32")
+            else:
+                return None
+            print(f"✅ Bellek içi kurs indeksi yüklendi ({index.count()} kurs, {index.precision})")
+            return index
+        except Exception as e:
+            print(f"⚠️ Bellek içi kurs indeksi yüklenemedi, ChromaDB kullanılacak: {e}")
+            return self.courses_collection
+        
     def _make_request(self, url: str, params: Optional[Dict] = None, max_retries: int = 3) -> Optional[requests.Response]:
         """Retry mantığı ile güvenli istek"""
         for attempt in range(max_retries):
@@ -237,60 +300,80 @@ class GitHubProfileAnalyzer:
         else:
             return "⭐ Başlangıç"
     
-    def retrieve_courses_from_chromadb(self, languages: List[str], level: str, n_results: int = 5) -> List[Dict]:
-        """ChromaDB'den kullanıcı profiline uygun kursları retrieve et"""
-        if self.courses_collection is None:
+    def retrieve_courses_from_chromadb(self, languages: List[str], level: str, n_results: int = 5,
+                                       cost: Optional[str] = None) -> List[Dict]:
+        """ChromaDB'den kullanıcı profiline uygun kursları retrieve et
+           Dil, seviye ve (opsiyonel) ücret filtreleri benzerlik aramasından önce indekse uygulanır"""
+        if self.course_search is None:
             print("⚠️ ChromaDB koleksiyonu mevcut değil")
             return []
         
         print(f"🔍 ChromaDB'den kurs aranıyor - Diller: {languages[:3]}")
         
-        # Her dil için ayrı ayrı sorgu yap
-        all_courses = []
-        seen_course_names = set()  # Duplikasyon önlemek için
+        # Tüm diller için sorgu metinlerini tek batch'te embed et ve tek sorgu yap
+        query_langs = languages[:5]  # İlk 5 dili kullan
+        if not query_langs:
+            return []
         
-        for lang in languages[:5]:  # İlk 5 dili kullan
-            try:
-                result = self.courses_collection.query(
-                    query_texts=[f"{lang} programming"],
-                    n_results=n_results
-                )
-                
-                # Sonuçları işle
-                # result yapısı: {'ids': [[...]], 'distances': [[...]], 'documents': [[...]], 'metadatas': [[...]]}
-                if result and result.get('documents') and result['documents'][0]:
-                    docs = result['documents'][0]
-                    metas = result.get('metadatas', [[]])[0]
-                    dists = result.get('distances', [[]])[0]
-                    for i in range(len(docs)):
-                        meta = metas[i] if i < len(metas) else {}
-                        course_name = meta.get('course_name') or meta.get('title') or docs[i][:80]
-                        link = meta.get('link') or meta.get('url') or meta.get('source') or ''
-                        
-                        # Duplikasyonu önle
-                        if course_name and course_name not in seen_course_names:
-                            course_info = {
-                                'content': docs[i],
-                                'metadata': {
-                                    **meta,
-                                    'link': link
-                                },
-                                'distance': dists[i] if i < len(dists) else None,
-                                'similarity': 1 - (dists[i] if i < len(dists) else 0),
-                                'language_match': lang  # Hangi dil için bulundu
-                            }
-                            all_courses.append(course_info)
-                            seen_course_names.add(course_name)
-                            
-            except Exception as e:
-                print(f"⚠️ {lang} için sorgu hatası: {e}")
-                continue
+        # MMR ancak n_results'tan fazla aday varsa çeşitlendirebilir; önce geniş bir havuz çek
+        fetch_k = n_results * max(1, COURSE_MMR_FETCH_FACTOR)
         
-        # Benzerlik skoruna göre sırala
-        all_courses.sort(key=lambda x: x['similarity'] if x.get('similarity') is not None else 0, reverse=True)
+        all_courses = []
+        try:
+            # Önce hazır tablodan bak; tabloda olmayan diller için tek batch sorgu yap
+            rows = {}
+            for lang in query_langs:
+                # Tablo sadece dil × seviye için hazır; ücret filtresi varsa canlı sorgu gerekir
+                row = self.course_table.lookup(lang, level) if self.course_table and not cost else None
+                if row:
+                    rows[lang] = {key: values[:fetch_k] for key, values in row.items()}
+            
+            live_langs = [lang for lang in query_langs if lang not in rows]
+            if live_langs:
+                query_embeddings = embed_queries([f"{lang} programming" for lang in live_langs])
+                live_result = self.course_search.query(
+                    query_embeddings=query_embeddings,
+                    n_results=fetch_k,
+                    where=build_course_where(languages=live_langs, level=level, cost=cost)
+                )
+                # Profil dilleri katalogda yoksa dil filtresi olmadan tekrar dene
+                if not any(live_result.get('ids') or [[]]):
+                    live_result = self.course_search.query(
+                        query_embeddings=query_embeddings,
+                        n_results=fetch_k,
+                        where=build_course_where(level=level, cost=cost)
+                    )
+                for i, lang in enumerate(live_langs):
+                    rows[lang] = {key: live_result.get(key, [[]])[i] for key in ('ids', 'documents', 'metadatas', 'distances')}
+            
+            result = {
+                key: [rows[lang][key] for lang in query_langs]
+                for key in ('ids', 'documents', 'metadatas', 'distances')
+            }
+            
+            # Sonuçları birleştir, duplikasyonları at ve benzerliğe göre sırala
+            # result yapısı: {'ids': [[...]], 'distances': [[...]], 'documents': [[...]], 'metadatas': [[...]]}
+            for candidate in merge_query_results(result, query_langs):
+                meta = candidate['metadata']
+                link = meta.get('link') or meta.get('url') or meta.get('source') or ''
+                distance = candidate['distance']
+                all_courses.append({
+                    'id': candidate['id'],
+                    'content': candidate['content'],
+                    'metadata': {
+                        **meta,
+                        'link': link
+                    },
+                    'distance': distance,
+                    'similarity': 1 - (distance if distance is not None else 0),
+                    'language_match': meta.get('language') or candidate['label']  # Hangi dil için bulundu
+                })
+        except Exception as e:
+            print(f"⚠️ Kurs sorgu hatası: {e}")
+            return []
         
-        # En iyi n_results kadarını al
-        top_courses = all_courses[:n_results * 2]  # Biraz fazla al, LLM seçsin
+        # Aday havuzundan alakalı ve birbirine benzemeyen n_results kurs seç (MMR)
+        top_courses = self._diversify_courses(all_courses, n_results)
         
         if top_courses:
             print(f"✅ {len(top_courses)} benzersiz kurs bulundu")
@@ -303,6 +386,25 @@ class GitHubProfileAnalyzer:
             
         
     
+    def _diversify_courses(self, courses: List[Dict], k: int, lambda_mult: float = 0.7) -> List[Dict]:
+        """Adaylardan MMR ile çeşitlendirilmiş k kurs seç; embedding alınamazsa ilk k kurs döner"""
+        if len(courses) <= k:
+            return courses
+        
+        ids = [c['id'] for c in courses]
+        try:
+            data = self.course_search.get(ids=ids, include=["embeddings"])
+            by_id = dict(zip(data['ids'], data['embeddings']))
+            if any(cid not in by_id for cid in ids):
+                return courses[:k]
+            embeddings = np.asarray([by_id[cid] for cid in ids], dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ Kurs embedding'leri alınamadı, çeşitlendirme atlandı: {e}")
+            return courses[:k]
+        
+        relevance = [c['similarity'] for c in courses]
+        return [courses[i] for i in mmr_select(embeddings, relevance, k, lambda_mult)]
+    
     def generate_ai_analysis(self, data: Dict, score_data: Dict) -> str:
         """LLM ile detaylı analiz oluştur"""
         
@@ -373,14 +475,18 @@ Puan Verileri:
             return fallback_text, [], fallback_courses_for_json
         
         # Retrieve edilen kursları formatlı string'e çevir
-        courses_context = "\n\n".join([
-            f"Kurs {i+1}:\n{course['content']}\nKurs Metadatası: {course['metadata']}\n(Benzerlik skoru: {course['similarity']:.2f})"
+        # Kurslar zaten çeşitlendirilmiş top-5; prompt'a sadece gerekli alanlar girer
+        courses_context = "\n".join([
+            f"{i+1}. {course['metadata'].get('course_name') or course['content'][:80]} "
+            f"({course['metadata'].get('platform', 'N/A')}, {course['metadata'].get('level', 'N/A')}, "
+            f"{course['metadata'].get('cost', 'N/A')}) - {course['metadata'].get('description', '')} "
+            f"Link: {course['metadata'].get('link', '')}"
             for i, course in enumerate(retrieved_courses[:5])
         ])
         
         template = """Sen profesyonel bir kariyer danışmanı ve kurs tavsiye motorusun.
 
-Aşağıda ChromaDB'den retrieve edilmiş, kullanıcının profiliyle ilgili kurslar var:
+Aşağıda kullanıcının profiline göre seçilmiş kurslar var:
 
 {courses_context}
 
@@ -389,8 +495,7 @@ Kullanıcının mevcut durumu:
 - Seviye: {level}
 - Repo sayısı: {repo_count}
 
-Bu retrieve edilmiş kursları kullanarak, kullanıcıya EN UYGUN 5 KURSU seç ve öner.
-Her kurs için şunları belirt:
+Bu kursları kullanıcıya öner. Her kurs için şunları belirt:
 - Kurs Adı ve Platform
 - Neden Bu Kursu Öneriyorum (kullanıcının profiline göre)
 - Tahmini Süre
@@ -6,11 +6,13 @@ from datetime import datetime, timedelta
 from langchain_core.prompts import ChatPromptTemplate
 import time
 import chromadb
-from chromadb.utils import embedding_functions
 import base64
 import re
 import logging
 
+from retrieval.embedding_cache import CachedOllamaEmbeddingFunction
+from retrieval.hnsw_profiles import hnsw_metadata
+
 class GitHubRepoAnalyzer:
     """Gelişmiş GitHub repo ve kullanıcı analizi yapan AI agent"""
     
@@ -38,7 +40,7 @@ class GitHubRepoAnalyzer:
         
         # ChromaDB başlat
         try:
-            self.embedding_fn = embedding_functions.OllamaEmbeddingFunction(
+            self.embedding_fn = CachedOllamaEmbeddingFunction(
                 model_name="nomic-embed-text",
                 url="http://localhost:11434/api/embeddings"
             )
@@ -56,7 +58,7 @@ class GitHubRepoAnalyzer:
                 self.repos_collection = self.chroma_client.create_collection(
                     name="github_repos",
                     embedding_function=self.embedding_fn,
-                    metadata={"description": "Popular GitHub repositories"}
+                    metadata={"description": "Popular GitHub repositories", **hnsw_metadata()}
                 )
                 #print(f"✅ ChromaDB 'github_repos' koleksiyonu oluşturuldu")
                 
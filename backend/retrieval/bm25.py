@@ -0,0 +1,87 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[\w+#.]+", re.UNICODE)
+
+
+def tokenize(text):
+    """Küçük harfe çevirip kelimelere böl; 'C++', 'C#', 'Node.js' gibi terimler korunur"""
+    return [token.strip(".") for token in TOKEN_PATTERN.findall(text.lower()) if token.strip(".")]
+
+
+class BM25Index:
+    """
+    Parçalar için bellek içi BM25 ters indeksi.
+
+    Dokümanlar ingestion sırasında add() ile eklenir; search() sadece sorgu
+    terimlerinin posting listelerini gezer, embedding hesaplamaz.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # terim -> {doc_id: terim frekansı}
+        self.doc_lengths = {}
+        self.documents = {}  # doc_id -> (metin, metadata)
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_ids, texts, metadatas=None):
+        """Dokümanları indekse ekle (aynı id tekrar eklenirse güncellenir)"""
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            for doc_id, text, meta in zip(doc_ids, texts, metadatas):
+                if doc_id in self.doc_lengths:
+                    self._remove(doc_id)
+                tokens = tokenize(text)
+                for term, freq in Counter(tokens).items():
+                    self.postings[term][doc_id] = freq
+                self.doc_lengths[doc_id] = len(tokens)
+                self.total_length += len(tokens)
+                self.documents[doc_id] = (text, meta or {})
+
+    def _remove(self, doc_id):
+        text, _ = self.documents.pop(doc_id)
+        for term in set(tokenize(text)):
+            self.postings[term].pop(doc_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query, k=10):
+        """
+        BM25 skoruna göre en iyi k doküman
+
+        Returns:
+            [(doc_id, skor, sorgu terimlerinin kapsanma oranı), ...]
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not terms or n_docs == 0:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores = defaultdict(float)
+            matched = defaultdict(int)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, freq in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+                    matched[doc_id] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(doc_id, score, matched[doc_id] / len(terms)) for doc_id, score in ranked]
+
+    def get(self, doc_id):
+        """(metin, metadata) çifti"""
+        return self.documents.get(doc_id)
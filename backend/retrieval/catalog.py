@@ -0,0 +1,114 @@
+import hashlib
+import json
+import time
+
+from retrieval.embedding import batched, embed_batches
+
+# Kursu tanımlayan alanlar; açıklama/ücret değişse de kimlik aynı kalır
+IDENTITY_FIELDS = ("language", "course_name", "platform", "url", "level")
+
+
+def course_document(course):
+    """Kursun embed edilecek metni"""
+    return f"{course['course_name']}. {course['description']}"
+
+
+def course_id(course):
+    """Liste sırasından bağımsız, kimlik alanlarından türetilen sabit id"""
+    key = "\x1f".join(str(course.get(field, "")).strip().lower() for field in IDENTITY_FIELDS)
+    return "course_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def course_hash(course):
+    """Kursun tüm içeriğinin hash'i (değişiklik tespiti için)"""
+    payload = json.dumps(course, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def index_catalog(courses):
+    """Kurs listesini {id: kurs} sözlüğüne çevir; birebir tekrar eden kayıtlar birleşir"""
+    return {course_id(course): course for course in courses}
+
+
+def ingest_courses(collection, items, batch_size=64, workers=4):
+    """
+    (id, kurs) çiftlerini batch'ler halinde embed edip her batch'i tek bir upsert ile yazar
+
+    Args:
+        collection: Hedef ChromaDB koleksiyonu
+        items: (id, kurs) çiftleri listesi
+        batch_size: Batch başına kurs sayısı
+        workers: Eşzamanlı embedding isteği sayısı
+
+    Returns:
+        (yazılan kurs sayısı, geçen süre sn)
+    """
+    total = len(items)
+    done = 0
+    start = time.perf_counter()
+
+    for batch, embeddings in embed_batches(
+        batched(items, batch_size),
+        workers=workers,
+        text_key=lambda item: course_document(item[1]),
+    ):
+        collection.upsert(
+            ids=[cid for cid, _ in batch],
+            documents=[course_document(course) for _, course in batch],
+            embeddings=embeddings,
+            metadatas=[{**course, "content_hash": course_hash(course)} for _, course in batch],
+        )
+        done += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"İşlenen kurs: {done}/{total} ({done / elapsed:.1f} kurs/sn)")
+
+    return total, time.perf_counter() - start
+
+
+def diff_catalog(collection, catalog):
+    """
+    Koleksiyondaki içerik hash'lerini katalogla karşılaştır
+
+    Returns:
+        (eklenecek id'ler, değişen id'ler, silinecek id'ler)
+    """
+    existing = collection.get(include=["metadatas"])
+    stored = {
+        cid: (meta or {}).get("content_hash")
+        for cid, meta in zip(existing["ids"], existing["metadatas"])
+    }
+
+    added = [cid for cid in catalog if cid not in stored]
+    changed = [
+        cid for cid, course in catalog.items()
+        if cid in stored and stored[cid] != course_hash(course)
+    ]
+    removed = [cid for cid in stored if cid not in catalog]
+    return added, changed, removed
+
+
+def sync_courses(collection, courses, batch_size=64, workers=4):
+    """
+    Koleksiyonu kataloğa göre artımlı senkronize eder: sadece yeni/değişen kurslar
+    embed edilip upsert edilir, katalogdan çıkanlar silinir. Koleksiyon silinmediği
+    için senkronizasyon boyunca sorgulanabilir kalır.
+
+    Returns:
+        {'added': [...], 'changed': [...], 'removed': [...], 'elapsed': float}
+    """
+    catalog = index_catalog(courses)
+    if len(catalog) < len(courses):
+        print(f"⚠️ {len(courses) - len(catalog)} tekrar eden kurs kaydı birleştirildi")
+
+    added, changed, removed = diff_catalog(collection, catalog)
+    print(f"🔄 Fark: {len(added)} yeni, {len(changed)} değişen, {len(removed)} silinen kurs")
+
+    elapsed = 0.0
+    to_write = [(cid, catalog[cid]) for cid in added + changed]
+    if to_write:
+        _, elapsed = ingest_courses(collection, to_write, batch_size, workers)
+
+    for id_batch in batched(removed, batch_size):
+        collection.delete(ids=id_batch)
+
+    return {"added": added, "changed": changed, "removed": removed, "elapsed": elapsed}
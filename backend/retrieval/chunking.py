@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from retrieval.embedding import batched
+from retrieval.embedding_cache import normalize_text
+
+DOCUMENT_REGISTRY_PATH = os.getenv("DOCUMENT_REGISTRY_PATH", "./document_registry.sqlite3")
+
+
+def chunk_text(text, chunk_size=500, overlap=50):
+    """Metni parçalara böl"""
+    words = text.split()
+    chunks = []
+
+    for i in range(0, len(words), chunk_size - overlap):
+        chunk = ' '.join(words[i:i + chunk_size])
+        if chunk.strip():
+            chunks.append(chunk)
+
+    return chunks
+
+
+def chunk_id(text):
+    """Normalize edilmiş parça metninden türetilen id; aynı içerik her zaman aynı id'yi alır"""
+    normalized = normalize_text(text).casefold()
+    return "chunk_" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(pdf_file):
+    """PDF'in bayt içeriğinin SHA-256 özeti; pdf_file yol veya dosya nesnesi olabilir"""
+    digest = hashlib.sha256()
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    else:
+        position = pdf_file.tell()
+        for block in iter(lambda: pdf_file.read(1 << 20), b""):
+            digest.update(block)
+        pdf_file.seek(position)
+    return digest.hexdigest()
+
+
+def iter_new_chunks(chunks, existing_ids, lookup_size=256, seen=None):
+    """
+    (metin, metadata) akışını (id, metin, metadata) akışına çevirir; aynı çalıştırmada
+    tekrar eden ve koleksiyonda zaten bulunan parçaları atlar.
+
+    Args:
+        chunks: (metin, metadata) iterable'ı
+        existing_ids: id listesi alıp koleksiyonda bulunanların kümesini döndüren fonksiyon
+        lookup_size: Koleksiyona tek seferde sorulacak id sayısı
+        seen: Verilirse dokümanın tüm parça id'leri (yeni ve zaten var olanlar) bu kümeye eklenir
+    """
+    seen = set() if seen is None else seen
+    for batch in batched(chunks, lookup_size):
+        candidates = []
+        for text, meta in batch:
+            cid = chunk_id(text)
+            if cid not in seen:
+                seen.add(cid)
+                candidates.append((cid, text, meta))
+        if not candidates:
+            continue
+        present = existing_ids([cid for cid, _, _ in candidates])
+        for candidate in candidates:
+            if candidate[0] not in present:
+                yield candidate
+
+
+class DocumentRegistry:
+    """Tamamen eklenmiş dokümanların parmak izleri (koleksiyon bazında, SQLite)"""
+
+    def __init__(self, path=DOCUMENT_REGISTRY_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, fingerprint TEXT NOT NULL, source TEXT, "
+            "chunks INTEGER, added_at REAL, PRIMARY KEY (collection, fingerprint))"
+        )
+        # Dokümanın tüm parça id'leri; başka bir kaynakla zaten eklenmiş (dedup edilmiş) parçalar dahil
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS document_chunks ("
+            "collection TEXT NOT NULL, fingerprint TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+            "PRIMARY KEY (collection, fingerprint, chunk_id))"
+        )
+        self._db.commit()
+
+    def chunk_ids(self, collection, fingerprint):
+        """Kayıtlı dokümanın parça id'leri (kayıt yoksa None)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM documents WHERE collection = ? AND fingerprint = ?", (collection, fingerprint)
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._db.execute(
+                "SELECT chunk_id FROM document_chunks WHERE collection = ? AND fingerprint = ?",
+                (collection, fingerprint)
+            ).fetchall()
+        return [chunk_id for chunk_id, in rows]
+
+    def forget(self, collection, fingerprint):
+        with self._lock:
+            for table in ("documents", "document_chunks"):
+                self._db.execute(
+                    f"DELETE FROM {table} WHERE collection = ? AND fingerprint = ?", (collection, fingerprint)
+                )
+            self._db.commit()
+
+    def is_ingested(self, collection, fingerprint, existing_ids, lookup_size=256):
+        """
+        Doküman kayıtlı ve tüm parçaları koleksiyonda hâlâ duruyorsa True.
+
+        existing_ids iter_new_chunks'taki gibi id listesi alıp koleksiyonda
+        bulunanları döndürür. Parçalar kaynak adından bağımsız, id ile aranır:
+        tamamı başka bir PDF'ten gelen (dedup edilmiş) doküman da atlanır.
+        Eksik parça varsa (koleksiyon temizlendi vb.) kayıt düşürülür ve doküman
+        yeniden eklenir; zaten var olan parçalar yine embed edilmez.
+        """
+        chunk_ids = self.chunk_ids(collection, fingerprint)
+        if chunk_ids is None:
+            return False
+        for batch in batched(chunk_ids, lookup_size):
+            if len(existing_ids(batch)) < len(batch):
+                self.forget(collection, fingerprint)
+                return False
+        return True
+
+    def record(self, collection, fingerprint, source, chunks, chunk_ids=()):
+        """
+        Doküman ingestion'ı başarıyla bittikten sonra çağrılmalı
+
+        Args:
+            chunks: Bu çalıştırmada yeni eklenen parça sayısı
+            chunk_ids: Dokümanın tüm parça id'leri (iter_new_chunks'ın seen kümesi)
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (collection, fingerprint, source, chunks, added_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (collection, fingerprint, source, chunks, time.time())
+            )
+            self._db.execute(
+                "DELETE FROM document_chunks WHERE collection = ? AND fingerprint = ?", (collection, fingerprint)
+            )
+            self._db.executemany(
+                "INSERT INTO document_chunks (collection, fingerprint, chunk_id) VALUES (?, ?, ?)",
+                [(collection, fingerprint, chunk_id) for chunk_id in chunk_ids]
+            )
+            self._db.commit()
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_document_registry():
+    """Süreç genelinde paylaşılan doküman kaydı"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = DocumentRegistry()
+        return _default_registry
@@ -0,0 +1,174 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import ollama
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+EMBED_MODEL = "nomic-embed-text"
+FASTEMBED_MODEL = "nomic-ai/nomic-embed-text-v1.5"
+
+# "ollama": HTTP üzerinden Ollama, "fastembed": süreç içi ONNX Runtime (CPU)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "ollama")
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0")) or None
+
+_client = None
+
+
+def get_client():
+    """Paylaşılan Ollama client'ı (bağlantılar batch'ler arasında yeniden kullanılır)"""
+    global _client
+    if _client is None:
+        _client = ollama.Client(host=OLLAMA_HOST)
+    return _client
+
+
+class EmbeddingBackend:
+    """Embedding backend'leri için ortak arayüz"""
+
+    name = ""
+
+    def __init__(self, model):
+        self.model = model
+        self._dimension = None
+
+    @property
+    def key(self):
+        """Önbellek ve koleksiyon metadata'sında kullanılan kimlik (örn. 'ollama:nomic-embed-text')"""
+        return f"{self.name}:{self.model}"
+
+    @property
+    def dimension(self):
+        if self._dimension is None:
+            self._dimension = len(self.embed(["dimension probe"])[0])
+        return self._dimension
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """Ollama /api/embed ile batch embedding; host verilmezse OLLAMA_HOST kullanılır"""
+
+    name = "ollama"
+
+    def __init__(self, model=EMBED_MODEL, host=None):
+        super().__init__(model)
+        self._client = None if host in (None, OLLAMA_HOST) else ollama.Client(host=host)
+
+    def embed(self, texts):
+        response = (self._client or get_client()).embed(model=self.model, input=list(texts))
+        return response["embeddings"]
+
+
+class FastEmbedBackend(EmbeddingBackend):
+    """fastembed ile süreç içi ONNX Runtime (CPU) embedding; HTTP isteği yok"""
+
+    name = "fastembed"
+
+    def __init__(self, model=FASTEMBED_MODEL, threads=EMBED_THREADS, batch_size=256):
+        super().__init__(model)
+        # Opsiyonel bağımlılık: sadece bu backend seçildiğinde gerekir
+        from fastembed import TextEmbedding
+
+        self.batch_size = batch_size
+        self._model = TextEmbedding(model_name=model, threads=threads)
+
+    def embed(self, texts):
+        return [vector.tolist() for vector in self._model.embed(list(texts), batch_size=self.batch_size)]
+
+
+BACKENDS = {
+    OllamaEmbeddingBackend.name: OllamaEmbeddingBackend,
+    FastEmbedBackend.name: FastEmbedBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    """İsimle (varsayılan: EMBED_BACKEND) süreç genelinde paylaşılan backend'i döndür"""
+    name = name or EMBED_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Bilinmeyen embedding backend'i: {name} (seçenekler: {', '.join(BACKENDS)})")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+
+def backend_metadata(backend=None):
+    """Koleksiyon metadata'sına yazılacak backend ve boyut bilgisi (boyut ölçümü bir embedding isteği yapar)"""
+    backend = backend or get_backend()
+    return {"embedding_backend": backend.key, "embedding_dimension": backend.dimension}
+
+
+def check_collection_backend(collection, backend=None):
+    """
+    Koleksiyonun oluşturulduğu backend'in şu anki backend ile uyumlu olup olmadığını kontrol et.
+    Metadata'sında backend bilgisi olmayan eski koleksiyonlar uyumlu kabul edilir.
+
+    Yalnızca backend kimliği (backend:model) karşılaştırılır; aynı model aynı boyutu
+    üretir, bu yüzden boyut ölçümü (embedding isteği) yapılmaz.
+    """
+    backend = backend or get_backend()
+    metadata = collection.metadata or {}
+    stored = metadata.get("embedding_backend")
+    if stored is None:
+        return True
+    if stored != backend.key:
+        print(
+            f"⚠️ '{collection.name}' koleksiyonu {stored} ({metadata.get('embedding_dimension')} boyut) ile "
+            f"oluşturulmuş, şu anki backend {backend.key}"
+        )
+        return False
+    return True
+
+
+def embed_texts(texts, backend=None):
+    """Metin listesini tek bir batch olarak embed et"""
+    if not texts:
+        return []
+    return (backend or get_backend()).embed(texts)
+
+
+def batched(items, batch_size):
+    """Liste veya iterator'ı batch_size boyutunda listelere böl (iterator tüketilirken bellekte tek batch tutulur)"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _embed_batch(batch, backend, text_key):
+    texts = [text_key(item) for item in batch] if text_key else batch
+    return embed_texts(texts, backend)
+
+
+def embed_batches(batches, workers=4, backend=None, text_key=None):
+    """
+    Batch'leri eşzamanlı embed eder ve (batch, embeddings) çiftlerini
+    giriş sırasıyla döndürür. Aynı anda en fazla workers * 2 batch bellekte tutulur.
+
+    Args:
+        batches: Listelerden oluşan iterable
+        workers: Paralel embedding isteği sayısı
+        backend: EmbeddingBackend (None ise varsayılan backend)
+        text_key: Batch elemanından metni çıkaran fonksiyon (None ise eleman metnin kendisi)
+    """
+    backend = backend or get_backend()
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in batches:
+            pending.append((batch, pool.submit(_embed_batch, batch, backend, text_key)))
+            if len(pending) >= workers * 2:
+                done_batch, future = pending.popleft()
+                yield done_batch, future.result()
+        while pending:
+            done_batch, future = pending.popleft()
+            yield done_batch, future.result()
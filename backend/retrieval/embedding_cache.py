@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import numpy as np
+from chromadb.utils import embedding_functions
+from langchain_core.embeddings import Embeddings
+
+from retrieval.embedding import EMBED_MODEL, OllamaEmbeddingBackend, embed_texts, get_backend
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+
+def normalize_text(text):
+    """Önbellek anahtarı için metni normalize et (Unicode NFC + boşluk sadeleştirme)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model, text):
+    return model + ":" + hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Model + normalize metin anahtarlı embedding önbelleği.
+
+    Önce bellek içi LRU'ya, sonra SQLite dosyasına bakılır; diske yazılan
+    kayıtlar süreç yeniden başlasa da korunur.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_items=EMBEDDING_CACHE_SIZE):
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """Anahtarlar için vektörleri döndür; bulunamayanlar None"""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    found[key] = vector
+        return [found.get(key) for key in keys]
+
+    def put_many(self, keys, vectors):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, list(vector))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in zip(keys, vectors)]
+            )
+            self._db.commit()
+
+    def embed(self, model, texts, embed_fn):
+        """
+        Metinleri önbellekten getir, eksikleri embed_fn ile tek seferde hesapla ve kaydet
+
+        Args:
+            model: Önbellek ad alanı (model adı)
+            texts: Metin listesi
+            embed_fn: Eksik metinler listesini alıp embedding listesi döndüren fonksiyon
+        """
+        keys = [cache_key(model, text) for text in texts]
+        vectors = self.get_many(keys)
+
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            miss_keys = list(missing)
+            miss_texts = [texts[missing[key][0]] for key in miss_keys]
+            new_vectors = embed_fn(miss_texts)
+            self.put_many(miss_keys, new_vectors)
+            for key, vector in zip(miss_keys, new_vectors):
+                for i in missing[key]:
+                    vectors[i] = list(vector)
+        return vectors
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Süreç genelinde paylaşılan önbellek"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+def embed_queries(texts, backend=None):
+    """Sorgu metinlerini seçili backend ile önbellekli olarak embed et"""
+    backend = backend or get_backend()
+    return get_embedding_cache().embed(backend.key, list(texts), lambda miss: embed_texts(miss, backend))
+
+
+class CachedOllamaEmbeddingFunction(embedding_functions.OllamaEmbeddingFunction):
+    """query_texts kullanan koleksiyonlar için önbellekli Ollama embedding fonksiyonu"""
+
+    def __init__(self, model_name=EMBED_MODEL, url="http://localhost:11434/api/embeddings"):
+        super().__init__(model_name=model_name, url=url)
+        # url endpoint'in tamamıdır (…/api/embeddings); client yalnızca sunucu adresini ister
+        parts = urlsplit(url)
+        self.backend = OllamaEmbeddingBackend(model_name, host=f"{parts.scheme}://{parts.netloc}")
+
+    def __call__(self, input):
+        return embed_queries(input, self.backend)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    LangChain embedding'i için sorgu önbelleği; doküman embedding'leri olduğu gibi geçer.
+    embeddings yerine factory verilirse model ilk önbellek kaçırmasında yüklenir.
+    """
+
+    def __init__(self, embeddings=None, model="", factory=None):
+        self._embeddings = embeddings
+        self._factory = factory
+        self._lock = threading.Lock()
+        self.model = model
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._factory()
+        return self._embeddings
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        return get_embedding_cache().embed(
+            self.model, [text], lambda miss: [self.embeddings.embed_query(miss[0])]
+        )[0]
@@ -0,0 +1,53 @@
+def build_course_where(languages=None, level=None, cost=None):
+    """
+    Kurs metadata alanları için ChromaDB `where` filtresi oluştur
+
+    Args:
+        languages: Kabul edilen diller (örn. ["Python", "Go"])
+        level: "Beginner" / "Intermediate" / "Advanced" (katalogda küçük harf)
+        cost: "free" / "paid"
+
+    Returns:
+        where sözlüğü; hiç filtre yoksa None
+    """
+    clauses = []
+    if languages:
+        clauses.append({"language": {"$in": list(languages)}})
+    if level:
+        clauses.append({"level": level.lower()})
+    if cost:
+        clauses.append({"cost": cost.lower()})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def matches_where(meta, where):
+    """ChromaDB where filtresinin ($eq/$ne/$in/$nin/$and/$or) bellek içi karşılığı"""
+    if not where:
+        return True
+    meta = meta or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(meta, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(meta, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = meta.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif meta.get(key) != condition:
+            return False
+    return True
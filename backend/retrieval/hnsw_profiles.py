@@ -0,0 +1,24 @@
+import os
+
+# Koleksiyon oluşturulurken uygulanan HNSW ayarları
+# M: düğüm başına komşu sayısı, construction_ef: kurulumda aday listesi, search_ef: sorguda aday listesi
+HNSW_PROFILES = {
+    "latency": {"hnsw:M": 8, "hnsw:construction_ef": 64, "hnsw:search_ef": 16},
+    "balanced": {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 100},
+    "recall": {"hnsw:M": 32, "hnsw:construction_ef": 200, "hnsw:search_ef": 256},
+}
+HNSW_PROFILE = os.getenv("HNSW_PROFILE", "balanced")
+
+
+def hnsw_metadata(profile=None, space="cosine"):
+    """
+    Seçilen profil için koleksiyon metadata'sı (hnsw:* anahtarları)
+
+    Args:
+        profile: "latency", "balanced" veya "recall" (None: HNSW_PROFILE ortam değişkeni)
+        space: Mesafe fonksiyonu
+    """
+    profile = profile or HNSW_PROFILE
+    if profile not in HNSW_PROFILES:
+        raise ValueError(f"Bilinmeyen HNSW profili: {profile} (seçenekler: {', '.join(HNSW_PROFILES)})")
+    return {"hnsw:space": space, **HNSW_PROFILES[profile], "hnsw_profile": profile}
@@ -0,0 +1,283 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from retrieval.filters import matches_where
+
+# Sıkıştırılmış ilk geçiş için desteklenen hassasiyetler (float32: sıkıştırma yok)
+PRECISIONS = ("float32", "float16", "int8")
+# Sıkıştırılmış skorlar bu kadar satırlık bloklar halinde hesaplanır (geçici bellek sınırı)
+SCORE_BLOCK_ROWS = 65536
+# Bu metadata alanları indeks oluşturulurken kolon dizilerine çıkarılır; where filtreleri
+# satır satır Python döngüsü yerine numpy karşılaştırmasıyla maskeye çevrilir
+FILTER_FIELDS = ("language", "level", "cost")
+
+
+class NumpyCourseIndex:
+    """
+    Kurs kataloğu için bellek içi kesin (exact) arama indeksi.
+
+    Embedding'ler normalize edilmiş, bitişik bir float32 matriste tutulur; top-k
+    tek bir matris-vektör çarpımı ve argpartition ile bulunur. query() çıktısı
+    ChromaDB'nin collection.query formatıyla aynıdır (cosine mesafe).
+
+    Opsiyonel sıkıştırılmış modda (float16 / int8) ilk geçiş küçük matris
+    üzerinde yapılır, en iyi k * rerank_factor aday tam hassasiyetli (genelde
+    memory-mapped) float32 matrisle yeniden sıralanır.
+
+    Kapsam: sıkıştırılmış ilk geçiş yalnızca bu indeksle aranan kurs kataloğu
+    içindir. PDF parçaları (hybrid_search, PDFRAGSystem.query) Chroma'nın HNSW
+    indeksinde float32 olarak aranır; Chroma vektör hassasiyetini seçtirmediği
+    için orada bir sıkıştırma yoktur.
+    """
+
+    def __init__(self, ids, embeddings, documents, metadatas, precision="float32", rerank_factor=4):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.embeddings = _normalize(np.ascontiguousarray(embeddings, dtype=np.float32))
+        self.compact = None
+        self.scale = None
+        self.rerank_factor = rerank_factor
+        self.columns = build_filter_columns(self.metadatas)
+        self.quantize(precision)
+
+    @property
+    def precision(self):
+        return "float32" if self.compact is None else ("int8" if self.scale is not None else "float16")
+
+    def quantize(self, precision="int8"):
+        """
+        İlk geçiş araması için sıkıştırılmış kopya oluştur
+
+        int8: boyut başına simetrik ölçek (x ≈ q * scale), float16: doğrudan dönüşüm
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Bilinmeyen hassasiyet: {precision} (seçenekler: {', '.join(PRECISIONS)})")
+        if precision == "float32":
+            self.compact, self.scale = None, None
+        elif precision == "float16":
+            self.compact, self.scale = self.embeddings.astype(np.float16), None
+        else:
+            max_abs = np.abs(self.embeddings).max(axis=0) if len(self.ids) else np.ones(self.embeddings.shape[1])
+            scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+            self.compact = np.clip(np.rint(self.embeddings / scale), -127, 127).astype(np.int8)
+            self.scale = scale
+        return self
+
+    @classmethod
+    def from_collection(cls, collection):
+        """ChromaDB koleksiyonundaki tüm kayıtları belleğe yükle"""
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        return cls(data["ids"], data["embeddings"], data["documents"], data["metadatas"])
+
+    def save(self, path):
+        """
+        Matrisi <path>.npy, id/doküman/metadata'yı <path>.json olarak kaydet.
+        Sıkıştırılmış kopya varsa <path>.<hassasiyet>.npy (int8 için ölçek <path>.scale.npy) olarak yazılır.
+        """
+        path = Path(path)
+        np.save(path.with_suffix(".npy"), self.embeddings)
+        if self.compact is not None:
+            np.save(path.with_suffix(f".{self.precision}.npy"), self.compact)
+        if self.scale is not None:
+            np.save(path.with_suffix(".scale.npy"), self.scale)
+        with open(path.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas},
+                f, ensure_ascii=False
+            )
+
+    @classmethod
+    def load(cls, path, mmap=True, precision="float32", rerank_factor=4):
+        """
+        Kaydedilmiş indeksi yükle; mmap=True ise tam hassasiyetli matris memory-mapped açılır.
+        precision float16/int8 ise sıkıştırılmış kopya RAM'e yüklenir (dosya yoksa hesaplanır).
+        """
+        path = Path(path)
+        with open(path.with_suffix(".json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls.__new__(cls)
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.metadatas = data["metadatas"]
+        # save() normalize edilmiş matrisi yazar, tekrar normalize etmeye gerek yok
+        index.embeddings = np.load(path.with_suffix(".npy"), mmap_mode="r" if mmap else None)
+        index.compact = None
+        index.scale = None
+        index.rerank_factor = rerank_factor
+        index.columns = build_filter_columns(index.metadatas)
+
+        compact_path = path.with_suffix(f".{precision}.npy")
+        if precision != "float32" and compact_path.exists():
+            index.compact = np.load(compact_path)
+            if precision == "int8":
+                index.scale = np.load(path.with_suffix(".scale.npy"))
+        else:
+            index.quantize(precision)
+        return index
+
+    def count(self):
+        return len(self.ids)
+
+    def search(self, query_embeddings, n_results=5, mask=None):
+        """
+        Her sorgu için en yakın n_results kaydın (indeksler, cosine mesafeler) çiftini döndür
+
+        Args:
+            mask: Opsiyonel (N,) bool dizisi; sadece True olan kayıtlar aday olur
+
+        Returns:
+            (top_idx: (Q, k) int dizisi, distances: (Q, k) float dizisi)
+        """
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embeddings.shape[1]))
+        available = len(self.ids) if mask is None else int(np.count_nonzero(mask))
+        k = min(n_results, available)
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+
+        if self.compact is None:
+            scores = queries @ self.embeddings.T  # (Q, N)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            return _top_k(scores, k)
+
+        # 1. geçiş: sıkıştırılmış matrisle yaklaşık skorlar, geniş aday kümesi
+        scores = self._compact_scores(queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        candidates, _ = _top_k(scores, min(k * self.rerank_factor, available), sort=False)
+
+        # 2. geçiş: adayları tam hassasiyetle yeniden sırala
+        exact = np.einsum("qd,qcd->qc", queries, np.asarray(self.embeddings[candidates.ravel()]).reshape(
+            candidates.shape + (self.embeddings.shape[1],)
+        ))
+        order, distances = _top_k(exact, k)
+        return np.take_along_axis(candidates, order, axis=1), distances
+
+    def _compact_scores(self, queries):
+        """Sıkıştırılmış matris üzerinde (Q, N) yaklaşık cosine skorları"""
+        effective = queries * self.scale if self.scale is not None else queries
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = self.compact[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = effective @ block.T
+        return scores
+
+    def get(self, ids, include=("embeddings", "documents", "metadatas")):
+        """collection.get gibi id'lere göre kayıtları döndür (bulunmayan id'ler atlanır)"""
+        positions = {cid: i for i, cid in enumerate(self.ids)}
+        rows = [positions[cid] for cid in ids if cid in positions]
+        result = {"ids": [self.ids[i] for i in rows]}
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.embeddings[rows])
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[i] for i in rows]
+        return result
+
+    def where_mask(self, where):
+        """
+        ChromaDB where filtresine uyan kayıtlar için bool maske
+
+        Filtre yalnızca kolon dizisi olan alanları kullanıyorsa maske vektörel
+        hesaplanır; aksi halde metadata'lar tek tek matches_where ile denetlenir.
+        """
+        mask = _column_mask(self.columns, where, len(self.ids))
+        if mask is not None:
+            return mask
+        return np.array([matches_where(meta, where) for meta in self.metadatas], dtype=bool)
+
+    def query(self, query_embeddings, n_results=5, where=None):
+        """collection.query ile aynı şekilde sonuç döndür"""
+        mask = self.where_mask(where) if where else None
+        top_idx, distances = self.search(query_embeddings, n_results, mask=mask)
+        return {
+            "ids": [[self.ids[i] for i in row] for row in top_idx],
+            "documents": [[self.documents[i] for i in row] for row in top_idx],
+            "metadatas": [[self.metadatas[i] for i in row] for row in top_idx],
+            "distances": distances.tolist(),
+        }
+
+
+def build_filter_columns(metadatas, fields=FILTER_FIELDS):
+    """
+    FILTER_FIELDS alanlarını kategorik kolonlara çıkar: alan → (değer → kod sözlüğü, int32 kod dizisi).
+    Eksik değer "" koduyla tutulur. Metin dışı değer içeren alan için kolon oluşturulmaz;
+    o alandaki filtreler satır satır denetlenir.
+    """
+    values = {field: [] for field in fields}
+    for meta in metadatas:
+        meta = meta or {}
+        for field in fields:
+            values[field].append(meta.get(field))
+    columns = {}
+    for field, column in values.items():
+        if not all(value is None or isinstance(value, str) for value in column):
+            continue
+        vocab = {}
+        codes = np.fromiter(
+            (vocab.setdefault("" if value is None else value, len(vocab)) for value in column),
+            dtype=np.int32, count=len(column)
+        )
+        columns[field] = (vocab, codes)
+    return columns
+
+
+def _column_mask(columns, where, count):
+    """where filtresinin kolon dizileriyle hesaplanan maskesi; desteklenmeyen filtrede None"""
+    mask = np.ones(count, dtype=bool)
+    for key, condition in (where or {}).items():
+        if key in ("$and", "$or"):
+            parts = [_column_mask(columns, sub, count) for sub in condition]
+            if any(part is None for part in parts):
+                return None
+            if key == "$and":
+                for part in parts:
+                    mask &= part
+            else:
+                mask &= np.logical_or.reduce(parts) if parts else np.zeros(count, dtype=bool)
+            continue
+
+        if key not in columns:
+            return None
+        vocab, codes = columns[key]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            operands = operand if op in ("$in", "$nin") else [operand]
+            # "" kolonda eksik değeri temsil eder; matches_where ile aynı sonucu garanti edemeyiz
+            if not all(isinstance(value, str) and value for value in operands):
+                return None
+            if op not in ("$eq", "$in", "$ne", "$nin"):
+                return None
+            matched = np.zeros(count, dtype=bool)
+            # Değer sayısı küçük (dil listesi vb.); kod başına tek karşılaştırma np.isin'den hızlı
+            for value in operands:
+                if value in vocab:
+                    matched |= codes == vocab[value]
+            mask &= matched if op in ("$eq", "$in") else ~matched
+    return mask
+
+
+def _top_k(scores, k, sort=True):
+    """Her satırdaki en yüksek k skorun indeksleri ve (sort=True ise sıralı) cosine mesafeleri"""
+    if k < scores.shape[1]:
+        top_idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top_idx = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+    top_scores = np.take_along_axis(scores, top_idx, axis=1)
+    if sort:
+        order = np.argsort(-top_scores, axis=1)
+        top_idx = np.take_along_axis(top_idx, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+    return top_idx, 1.0 - top_scores
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,79 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+_DONE = object()
+
+
+def iter_pdf_pages(pdf_file):
+    """PDF sayfalarını (sayfa no, metin) olarak tek tek üret; pdf_file yol veya dosya nesnesi olabilir"""
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    for page_num, page in enumerate(pdf_reader.pages):
+        yield page_num + 1, page.extract_text() or ""
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """[start, stop) aralığındaki sayfaların (sayfa no, metin) listesi; süreç havuzunda çalışır"""
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [(n + 1, pdf_reader.pages[n].extract_text() or "") for n in range(start, stop)]
+
+
+def iter_pdf_pages_parallel(pdf_path, workers, pages_per_task=8):
+    """
+    Sayfa aralıklarını süreç havuzunda çıkarır ve sayfaları sırayla üretir.
+    Aynı anda en fazla workers * 2 aralık bellekte tutulur.
+    """
+    with open(pdf_path, 'rb') as file:
+        page_count = len(PyPDF2.PdfReader(file).pages)
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, page_count, pages_per_task):
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, min(start + pages_per_task, page_count)))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def prefetch(iterable, maxsize=32):
+    """
+    iterable'ı arka plan thread'inde çalıştırıp sınırlı bir kuyruk üzerinden üretir.
+    Üretici tüketiciden en fazla maxsize eleman önde gidebilir; hata tüketiciye aktarılır.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put((_DONE, e))
+            return
+        buffer.put((_DONE, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is _DONE:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            yield item
+    finally:
+        stop.set()
+        # Üretici kuyruk doluyken bekliyorsa serbest bırak
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.1)
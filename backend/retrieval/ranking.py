@@ -0,0 +1,117 @@
+import numpy as np
+
+
+def course_name_of(meta, document):
+    """Kurs adını metadata'dan (yoksa dokümandan) çıkar"""
+    return meta.get('course_name') or meta.get('title') or document[:80]
+
+
+def merge_query_results(result, labels):
+    """
+    Çoklu sorgu sonucunu (her satır bir sorgu) tek listede birleştirir,
+    mesafeye göre sıralar ve aynı kursu sadece en iyi eşleşmesiyle tutar.
+
+    Args:
+        result: collection.query çıktısı ({'ids': [[...]], 'distances': [[...]], ...})
+        labels: Her sorgu satırının etiketi (örn. dil adı)
+
+    Returns:
+        [{'id', 'content', 'metadata', 'distance', 'label'}, ...] en yakından uzağa
+    """
+    docs = result.get('documents') or []
+    metas = result.get('metadatas') or [[] for _ in docs]
+    dists = result.get('distances') or [[] for _ in docs]
+    ids = result.get('ids') or [[] for _ in docs]
+
+    flat_docs, flat_metas, flat_ids, flat_labels, flat_dists = [], [], [], [], []
+    for row, label in enumerate(labels[:len(docs)]):
+        for i, doc in enumerate(docs[row]):
+            flat_docs.append(doc)
+            flat_metas.append(metas[row][i] if i < len(metas[row]) else {})
+            flat_ids.append(ids[row][i] if i < len(ids[row]) else None)
+            flat_labels.append(label)
+            flat_dists.append(dists[row][i] if i < len(dists[row]) else np.inf)
+
+    if not flat_docs:
+        return []
+
+    # Tüm sorguların adaylarını tek seferde sırala
+    order = np.argsort(np.asarray(flat_dists, dtype=np.float64), kind="stable")
+
+    merged = []
+    seen = set()
+    for i in order:
+        meta = flat_metas[i] or {}
+        name = course_name_of(meta, flat_docs[i])
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        merged.append({
+            'id': flat_ids[i],
+            'content': flat_docs[i],
+            'metadata': meta,
+            'distance': None if np.isinf(flat_dists[i]) else flat_dists[i],
+            'label': flat_labels[i],
+        })
+    return merged
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Birden fazla sıralamayı reciprocal rank fusion ile birleştir
+
+    Args:
+        rankings: Her biri en iyiden kötüye id listesi olan sıralamalar
+        k: RRF sabiti (büyüdükçe alt sıraların etkisi artar)
+
+    Returns:
+        Birleşik skora göre sıralı [(id, skor), ...]
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def mmr_select(embeddings, relevance, k, lambda_mult=0.7):
+    """
+    Maximal marginal relevance ile çeşitlendirilmiş k aday seç
+
+    Aday-aday benzerlik matrisi bir kez hesaplanır; her adımda sadece seçilen
+    adayın sütunuyla "en yakın seçilmiş" vektörü güncellenir.
+
+    Args:
+        embeddings: (N, D) aday embedding'leri
+        relevance: (N,) sorguya benzerlik skorları
+        k: Seçilecek aday sayısı
+        lambda_mult: 1.0 sadece alaka, 0.0 sadece çeşitlilik
+
+    Returns:
+        Seçilen adayların indeksleri (seçim sırasıyla)
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    k = min(k, n)
+    if k == 0:
+        return []
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+    similarity = embeddings @ embeddings.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+    max_similarity = similarity[:, first].copy()
+
+    for _ in range(1, k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        available[chosen] = False
+        np.maximum(max_similarity, similarity[:, chosen], out=max_similarity)
+    return selected
@@ -0,0 +1,146 @@
+import json
+import os
+
+import numpy as np
+
+from retrieval.filters import build_course_where
+
+# generate_course_recommendations'ın ürettiği seviyeler
+LEVELS = ("Beginner", "Intermediate", "Advanced")
+COURSE_TABLE_PATH = os.getenv("COURSE_TABLE_PATH", "./course_recommendations.json")
+
+
+def table_key(language, level):
+    return f"{language.strip().lower()}|{level.strip().lower()}"
+
+
+def language_query(language):
+    """retrieve_courses_from_chromadb ile aynı sorgu metni"""
+    return f"{language} programming"
+
+
+def entry_mask(index, language, level):
+    """Sadece verilen dil ve seviyedeki kursları seçen maske (canlı sorguyla aynı filtre)"""
+    return index.where_mask(build_course_where(languages=[language], level=level))
+
+
+def catalog_languages(index):
+    return sorted({(meta or {}).get("language") for meta in index.metadatas} - {None, ""})
+
+
+class RecommendationTable:
+    """
+    Ingestion sırasında hesaplanan dil × seviye → sıralı top-N kurs tablosu.
+
+    Her kayıt collection.query'nin tek satırlık formatındadır, böylece profil
+    isteklerinde vektör araması yerine sözlük lookup'ı yapılır.
+    """
+
+    def __init__(self, entries=None, top_n=20):
+        self.entries = entries or {}
+        self.top_n = top_n
+
+    @classmethod
+    def load(cls, path=COURSE_TABLE_PATH):
+        """Tabloyu yükle; dosya yoksa None"""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("entries", {}), data.get("top_n", 20))
+
+    def save(self, path=COURSE_TABLE_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"top_n": self.top_n, "entries": self.entries}, f, ensure_ascii=False)
+
+    def lookup(self, language, level):
+        """Dil ve seviye için hazır sonuç satırı (yoksa None)"""
+        return self.entries.get(table_key(language, level))
+
+    def _rank(self, index, query_embedding, language, level):
+        top_idx, distances = index.search([query_embedding], self.top_n, mask=entry_mask(index, language, level))
+        row = top_idx[0]
+        return {
+            "ids": [index.ids[i] for i in row],
+            "documents": [index.documents[i] for i in row],
+            "metadatas": [index.metadatas[i] for i in row],
+            "distances": distances[0].tolist(),
+        }
+
+    def build(self, index, embed_fn):
+        """
+        Katalogdaki her dil ve seviye için tabloyu baştan oluştur
+
+        Args:
+            index: Kataloğu içeren NumpyCourseIndex
+            embed_fn: Metin listesini embedding listesine çeviren fonksiyon
+        """
+        languages = catalog_languages(index)
+        query_embeddings = embed_fn([language_query(lang) for lang in languages])
+        self.entries = {}
+        for lang, query_embedding in zip(languages, query_embeddings):
+            for level in LEVELS:
+                self._store(table_key(lang, level), self._rank(index, query_embedding, lang, level))
+        return len(self.entries)
+
+    def _store(self, key, entry):
+        # Boş kayıt saklanmaz; lookup kaçırır ve canlı sorgu (dil filtresiz yedeğiyle) devreye girer
+        if entry["ids"]:
+            self.entries[key] = entry
+        else:
+            self.entries.pop(key, None)
+
+    def update(self, index, touched_ids, embed_fn):
+        """
+        Katalog değişikliğinden etkilenen kayıtları yeniden hesapla.
+
+        Bir kayıt; değişen/silinen bir kursu içeriyorsa, yeni/değişen bir kurs
+        mevcut top-N eşiğini geçiyorsa ya da yeni bir dil için ise yenilenir.
+
+        Returns:
+            Yeniden hesaplanan kayıt sayısı
+        """
+        touched = set(touched_ids)
+        if not touched:
+            return 0
+
+        languages = catalog_languages(index)
+        query_embeddings = np.asarray(embed_fn([language_query(lang) for lang in languages]), dtype=np.float32)
+        query_embeddings /= np.maximum(np.linalg.norm(query_embeddings, axis=1, keepdims=True), 1e-12)
+
+        positions = [i for i, cid in enumerate(index.ids) if cid in touched]
+        candidate_levels = [str((index.metadatas[i] or {}).get("level", "")).lower() for i in positions]
+        candidate_langs = [(index.metadatas[i] or {}).get("language") for i in positions]
+        # Yeni/değişen kursların her dil sorgusuna benzerliği: (L, len(positions))
+        candidate_scores = query_embeddings @ np.asarray(index.embeddings[positions]).T if positions else None
+
+        valid_keys = set()
+        refreshed = 0
+        for li, lang in enumerate(languages):
+            for level in LEVELS:
+                key = table_key(lang, level)
+                valid_keys.add(key)
+                entry = self.entries.get(key)
+
+                stale = entry is None or bool(touched & set(entry["ids"]))
+                if not stale and candidate_scores is not None:
+                    # Sadece bu kayda girebilecek adaylar: aynı dil ve aynı seviye
+                    same_entry = [
+                        j for j, (lvl, cand_lang) in enumerate(zip(candidate_levels, candidate_langs))
+                        if lvl == level.lower() and cand_lang == lang
+                    ]
+                    if same_entry:
+                        if len(entry["ids"]) < self.top_n:
+                            stale = True
+                        else:
+                            threshold = 1.0 - max(entry["distances"])
+                            stale = bool((candidate_scores[li, same_entry] >= threshold).any())
+
+                if stale:
+                    self._store(key, self._rank(index, query_embeddings[li], lang, level))
+                    refreshed += 1
+
+        # Katalogdan tamamen çıkan diller
+        for key in set(self.entries) - valid_keys:
+            del self.entries[key]
+        return refreshed
@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+from retrieval.embedding_cache import normalize_text
+
+
+class ResultCache:
+    """
+    Arama sonuçları için TTL + LRU önbellek.
+
+    Anahtar normalize sorgu ve koleksiyon sürümüdür; invalidate() sürümü
+    artırdığı için yazmadan önceki sonuçlar bir daha dönmez. get() sürümü de
+    döndürür: arama sürerken koleksiyona yazılırsa put() eski sonucu kaydetmez.
+    """
+
+    def __init__(self, max_items=512, ttl_seconds=600):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, query, version):
+        return (normalize_text(query).casefold(), version)
+
+    def get(self, query):
+        """(geçerli önbellek sonucu ya da None, okunduğu andaki sürüm)"""
+        with self._lock:
+            version = self.version
+            key = self._key(query, version)
+            item = self._items.get(key)
+            if item is None or time.monotonic() - item[0] > self.ttl_seconds:
+                self._items.pop(key, None)
+                self.misses += 1
+                return None, version
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1], version
+
+    def put(self, query, value, version):
+        """Sonucu kaydet; get()'ten bu yana sürüm değiştiyse (araya yazma girdiyse) kaydetme"""
+        with self._lock:
+            if version != self.version:
+                return False
+            key = self._key(query, version)
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+            return True
+
+    def invalidate(self):
+        """Koleksiyona yazıldığında çağrılır: sürümü artırır ve eski sonuçları atar"""
+        with self._lock:
+            self.version += 1
+            self._items.clear()
@@ -0,0 +1,170 @@
+import json
+import mmap
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from retrieval.numpy_index import NumpyCourseIndex, build_filter_columns
+
+SNAPSHOT_VERSION = 1
+
+
+class LazyRecords:
+    """
+    records.jsonl dosyasının memory-mapped, salt okunur görünümü.
+    Satırlar sadece erişildiğinde çözülür; dosya sayfaları süreçler arasında paylaşılır.
+    """
+
+    def __init__(self, path, offsets, field):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+        self._offsets = offsets
+        self._field = field
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        line = self._mmap[int(self._offsets[i]):int(self._offsets[i + 1])]
+        return json.loads(line)[self._field]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def export_snapshot(index, path, manifest=None, keep=3):
+    """
+    İndeksi salt okunur, mmap ile açılabilen yeni bir sürüm dizinine yaz ve
+    path'i atomik olarak bu sürüme çevir
+
+    path bir sembolik bağdır (ör. snapshots/courses → courses-<zaman>); her export
+    yeni bir dizine yazılır ve bağ os.replace ile tek adımda değiştirilir. Eski
+    snapshot'ı mmap'lemiş süreçler kendi dosyalarını okumaya devam eder; en yeni
+    `keep` sürüm dışındakiler silinir (açık mmap'ler silinen dosyada da geçerli kalır).
+
+    Sürüm dizini içeriği:
+        manifest.json   sürüm, kayıt sayısı, boyut, hassasiyet ve ek bilgiler
+        embeddings.npy  normalize float32 matris (+ sıkıştırılmış kopya varsa compact.npy / scale.npy)
+        ids.npy         sabit genişlikli unicode id dizisi
+        records.jsonl   her satırda {"document", "metadata"}
+        offsets.npy     records.jsonl satır başlangıçları (int64, N + 1)
+        filter_<alan>.npy  where filtreleri için kategorik kod kolonu (int32, N); değer
+                        listesi manifest'teki "filters" alanında
+    """
+    link = Path(path)
+    link.parent.mkdir(parents=True, exist_ok=True)
+    path = link.parent / f"{link.name}-{time.time_ns()}"
+    path.mkdir()
+
+    np.save(path / "embeddings.npy", np.ascontiguousarray(index.embeddings, dtype=np.float32))
+    if index.compact is not None:
+        np.save(path / "compact.npy", index.compact)
+    if index.scale is not None:
+        np.save(path / "scale.npy", index.scale)
+    np.save(path / "ids.npy", np.asarray(index.ids, dtype=str))
+
+    offsets = [0]
+    with open(path / "records.jsonl", "wb") as f:
+        for document, metadata in zip(index.documents, index.metadatas):
+            line = json.dumps({"document": document, "metadata": metadata}, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(path / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    # Filtre kolonları mmap ile açılır; sorgu başına records.jsonl çözülmez
+    columns = getattr(index, "columns", None)
+    if columns is None:
+        columns = build_filter_columns(index.metadatas)
+    filters = {}
+    for field, (vocab, codes) in columns.items():
+        np.save(path / f"filter_{field}.npy", np.asarray(codes, dtype=np.int32))
+        filters[field] = sorted(vocab, key=vocab.get)
+
+    with open(path / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": SNAPSHOT_VERSION,
+            "count": index.count(),
+            "dimension": int(index.embeddings.shape[1]),
+            "precision": index.precision,
+            "filters": filters,
+            "created_at": time.time(),
+            **(manifest or {}),
+        }, f, ensure_ascii=False, indent=2)
+
+    # Snapshot salt okunur: çalışan süreçler dosyaları değiştirmemeli
+    for written in path.iterdir():
+        written.chmod(0o444)
+
+    # Eski düzende path gerçek bir dizindi; onu da bir sürüm olarak kenara al
+    if link.is_dir() and not link.is_symlink():
+        link.rename(link.parent / f"{link.name}-{time.time_ns()}")
+    tmp_link = link.parent / f".{link.name}.tmp"
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    tmp_link.symlink_to(path.name)
+    os.replace(tmp_link, link)
+
+    versions = sorted(
+        (p for p in link.parent.glob(f"{link.name}-*") if p.is_dir() and not p.is_symlink()),
+        key=lambda p: p.name,
+    )
+    for old in versions[:-keep] if keep > 0 else []:
+        if old != path:
+            shutil.rmtree(old)
+    return link
+
+
+def read_manifest(path):
+    with open(Path(path) / "manifest.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(path, precision=None, rerank_factor=4):
+    """
+    Snapshot'ı kopyasız aç: matrisler ve kayıtlar memory-mapped, metadata erişildikçe çözülür
+
+    Args:
+        path: export_snapshot ile yazılmış dizin (ya da güncel sürüme işaret eden bağ)
+        precision: İlk geçiş hassasiyeti; None ise snapshot'ta kayıtlı olan kullanılır
+    """
+    # Bağı bir kez çöz: açılış sırasında yeni bir export gelse de tüm dosyalar aynı sürümden okunur
+    path = Path(path).resolve()
+    manifest = read_manifest(path)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Desteklenmeyen snapshot sürümü: {manifest.get('version')}")
+
+    offsets = np.load(path / "offsets.npy", mmap_mode="r")
+    index = NumpyCourseIndex.__new__(NumpyCourseIndex)
+    index.ids = np.load(path / "ids.npy", mmap_mode="r").tolist()
+    index.documents = LazyRecords(path / "records.jsonl", offsets, "document")
+    index.metadatas = LazyRecords(path / "records.jsonl", offsets, "metadata")
+    index.embeddings = np.load(path / "embeddings.npy", mmap_mode="r")
+    index.compact = None
+    index.scale = None
+    index.rerank_factor = rerank_factor
+    if "filters" in manifest:
+        index.columns = {
+            field: ({value: code for code, value in enumerate(values)},
+                    np.load(path / f"filter_{field}.npy", mmap_mode="r"))
+            for field, values in manifest["filters"].items()
+        }
+    else:
+        # Filtre kolonu olmayan eski snapshot: kolonlar açılışta bir kez çıkarılır
+        index.columns = build_filter_columns(index.metadatas)
+
+    stored_precision = manifest.get("precision", "float32")
+    precision = precision or stored_precision
+    if precision != "float32" and precision == stored_precision:
+        index.compact = np.load(path / "compact.npy", mmap_mode="r")
+        if (path / "scale.npy").exists():
+            index.scale = np.load(path / "scale.npy")
+    else:
+        index.quantize(precision)
+    return index
@@ -50,6 +50,7 @@ def delete_story(theme: str):
     
 class QueryRequest(BaseModel):
     question: str
+    session_id: str | None = None
 
 
 class QueryResponse(BaseModel):
@@ -61,6 +62,6 @@ class QueryResponse(BaseModel):
 
 @router.post("/request",response_model=QueryResponse)
 async def ask_question(request: QueryRequest):
-    answer = get_response_model(request.question)
+    answer = get_response_model(request.question, session_id=request.session_id)
 
     return QueryResponse(answer=answer)
\ No newline at end of file
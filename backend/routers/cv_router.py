@@ -1,8 +1,18 @@
-from fastapi import APIRouter
+import asyncio
+import contextlib
+import json
+import tempfile
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from fastapi import UploadFile, File
+from fastapi.responses import StreamingResponse
 """from core.model import StoryGenerator"""
-from cv_mechanism.converter import full_stream
+from typing import Optional
+
+from cv_mechanism.inference_worker import get_inference_pool
+from cv_mechanism.job_queue import CVJobService, DONE, FAILED
+from cv_mechanism.model_manager import CV_MODEL_PRELOAD
 router = APIRouter(
     prefix="/cv",
     tags=["cv"]
@@ -28,15 +38,20 @@ class QueryResponse2(BaseModel):
     cv_score:str
 
 
-@router.post("/cvextract")
-async def cv_extract(file: UploadFile = File(...)):
-    # PDF'i kaydet
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str] = None
+    created_at: float
+    queue_position: Optional[int] = None
+    queue_length: int
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+
 
-    # Model analizini çalıştır
-    out = full_stream(temp_path)
+def to_response(out):
+    if len(out) != 9:
+        raise HTTPException(status_code=502, detail=f"Model raporu beklenen 9 bölüm yerine {len(out)} bölüm içeriyor")
     (short_summary, key_strength, weakness, jobs, suggests, ats, interview, questions, cv_score) = out.values()
     return QueryResponse2(
         short_summary=short_summary,
@@ -48,4 +63,122 @@ async def cv_extract(file: UploadFile = File(...)):
         interview=interview,
         questions=questions,
         cv_score=cv_score
-    )
\ No newline at end of file
+    )
+
+
+# Model ayrı worker süreç(ler)inde çalışır; API süreci torch'u hiç import etmez
+inference_pool = get_inference_pool()
+# Uzun analizler için iş kuyruğu: yükleme hemen kabul edilir, sonuç sonradan alınır
+job_service = CVJobService(inference_pool)
+
+
+@router.on_event("startup")
+def preload_cv_model():
+    # Preload açıksa worker'lar açılışta başlatılır, aksi halde ilk CV isteğinde
+    if CV_MODEL_PRELOAD:
+        inference_pool.start()
+    job_service.resume()
+
+
+@router.on_event("shutdown")
+def stop_cv_workers():
+    # Önce işler bırakılır ki havuz kapanırken bekleyen işler başarısız sayılmasın
+    job_service.stop()
+    inference_pool.stop()
+
+
+@router.get("/ready")
+def cv_ready():
+    """Worker havuzu ve model durumu (cold / loading / warm / failed)"""
+    return {**inference_pool.status(), "jobs": job_service.queue_info()}
+
+
+async def save_upload(file):
+    """Yüklemeyi her istek için ayrı bir geçici dosyaya yaz; aynı isimli yüklemeler çakışmaz"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as f:
+        f.write(await file.read())
+    return f.name
+
+
+@router.post("/cvextract")
+async def cv_extract(file: UploadFile = File(...)):
+    # PDF'i kaydet
+    temp_path = await save_upload(file)
+
+    # Model analizini worker sürecinde çalıştır; event loop bu sırada serbest kalır.
+    # Dosya görevin sahipliğine geçer ve iş bitince (iptal dahil) worker tarafından silinir.
+    try:
+        out = await inference_pool.run(temp_path, cleanup=True)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="CV analizi zaman aşımına uğradı")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"CV analizi başarısız: {e}")
+    return to_response(out)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/cvextract/stream")
+async def cv_extract_stream(file: UploadFile = File(...)):
+    """
+    CV raporunu SSE ile akış halinde gönder.
+
+    Olaylar: 'token' (üretilen metin parçası), 'section' (tamamlanan bölüm),
+    en sonda 'done' (cvextract ile aynı alanlar) ya da 'error'.
+    """
+    temp_path = await save_upload(file)
+
+    async def events():
+        # Dosya göreve ait: worker işi bitirince (ya da iptalde atlayınca) siler.
+        # aclosing, istemci ayrıldığında stream()'in kapanıp görevi iptal etmesini sağlar.
+        try:
+            async with contextlib.aclosing(inference_pool.stream(temp_path, cleanup=True)) as updates:
+                async for kind, data in updates:
+                    if kind == "token":
+                        yield sse_event("token", {"text": data})
+                    elif kind == "section":
+                        title, content = data
+                        yield sse_event("section", {"title": title, "content": content})
+                    else:
+                        yield sse_event("done", to_response(data).model_dump())
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except asyncio.TimeoutError:
+            yield sse_event("error", {"detail": "CV analizi zaman aşımına uğradı"})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"CV analizi başarısız: {e}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_cv_job(file: UploadFile = File(...)):
+    """CV'yi kuyruğa ekle ve iş kimliğini hemen döndür"""
+    return job_service.submit(file.filename, await file.read())
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def cv_job_status(job_id: str):
+    """İş durumu, kuyruk sırası ve tahmini bitiş süresi"""
+    info = job_service.status(job_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return info
+
+
+@router.get("/jobs/{job_id}/result", response_model=QueryResponse2)
+def cv_job_result(job_id: str):
+    job = job_service.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"CV analizi başarısız: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"İş henüz tamamlanmadı (durum: {job['status']})")
+    return to_response(job["result"])
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""RecommendationTable.update() artımlı güncellemesi, build() ile aynı tabloyu üretmeli"""
+import numpy as np
+
+from retrieval.numpy_index import NumpyCourseIndex
+from retrieval.recommendation_table import LEVELS, RecommendationTable
+
+DIM = 16
+LANGUAGES = ("Python", "Go", "Rust")
+
+
+def make_embed_fn(seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = {}
+
+    def embed_fn(texts):
+        for text in texts:
+            if text not in vectors:
+                vectors[text] = rng.normal(size=DIM)
+        return [vectors[text] for text in texts]
+
+    return embed_fn
+
+
+def make_courses(count=60, seed=1):
+    rng = np.random.default_rng(seed)
+    return {
+        f"course-{i}": (
+            rng.normal(size=DIM),
+            {"language": LANGUAGES[i % len(LANGUAGES)], "level": LEVELS[(i // 3) % len(LEVELS)].lower()},
+        )
+        for i in range(count)
+    }
+
+
+def make_index(courses):
+    ids = sorted(courses)
+    return NumpyCourseIndex(
+        ids, [courses[cid][0] for cid in ids], [cid for cid in ids], [courses[cid][1] for cid in ids]
+    )
+
+
+def assert_matches_build(table, index, embed_fn):
+    fresh = RecommendationTable(top_n=table.top_n)
+    fresh.build(index, embed_fn)
+    assert set(table.entries) == set(fresh.entries)
+    for key, entry in fresh.entries.items():
+        assert table.entries[key]["ids"] == entry["ids"], key
+
+
+def test_update_matches_build_after_add_change_and_remove():
+    embed_fn = make_embed_fn()
+    courses = make_courses()
+    table = RecommendationTable(top_n=3)
+    table.build(make_index(courses), embed_fn)
+
+    # Ekleme: "Python programming" sorgusuna çok yakın yeni bir kurs eşiği geçmeli
+    query = embed_fn(["Python programming"])[0]
+    courses["course-new"] = (query + 0.01, {"language": "Python", "level": "beginner"})
+    index = make_index(courses)
+    table.update(index, ["course-new"], embed_fn)
+    assert "course-new" in table.lookup("Python", "Beginner")["ids"]
+    assert_matches_build(table, index, embed_fn)
+
+    # Değişiklik: tablodaki bir kurs başka dile ve seviyeye taşınır
+    moved = table.lookup("Go", "Advanced")["ids"][0]
+    courses[moved] = (courses[moved][0], {"language": "Rust", "level": "intermediate"})
+    index = make_index(courses)
+    table.update(index, [moved], embed_fn)
+    assert moved not in table.lookup("Go", "Advanced")["ids"]
+    assert_matches_build(table, index, embed_fn)
+
+    # Silme: tablodaki bir kurs katalogdan çıkar
+    removed = table.lookup("Rust", "Beginner")["ids"][0]
+    del courses[removed]
+    index = make_index(courses)
+    table.update(index, [removed], embed_fn)
+    assert removed not in table.lookup("Rust", "Beginner")["ids"]
+    assert_matches_build(table, index, embed_fn)
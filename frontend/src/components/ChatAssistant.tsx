@@ -9,6 +9,20 @@ import { Send, Bot, User, Sparkles } from 'lucide-react';
 import { ScrollArea } from './ui/scroll-area';
 import api from "./api"; // axios instance
 
+// Her sekme kendi sohbet oturumunu kullanır; backend geçmişi bu id ile ayırır
+function getSessionId(): string {
+  const key = 'chat-session-id';
+  let id = sessionStorage.getItem(key);
+  if (!id) {
+    id =
+      typeof crypto !== 'undefined' && 'randomUUID' in crypto
+        ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    sessionStorage.setItem(key, id);
+  }
+  return id;
+}
+
 interface Message {
   id: number;
   role: 'user' | 'assistant';
@@ -28,6 +42,7 @@ export function ChatAssistant() {
   ]);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  const [sessionId] = useState(getSessionId);
 
   const suggestedQuestions = [
     'Help me understand calculus derivatives',
@@ -54,6 +69,7 @@ export function ChatAssistant() {
       // 🧠 API isteği: burada backend URL’ini kendi adresinle değiştir
       const response = await api.post('/assistant/request', {
         question: input,
+        session_id: sessionId,
       });
 
       const aiResponse: Message = {